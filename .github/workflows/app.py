@@ -1,214 +1,47 @@
 # -*- coding: utf-8 -*-
-import io, re, unicodedata
+import hashlib, io, sys
+from importlib.util import find_spec
+from pathlib import Path
 import pandas as pd
 import streamlit as st
 
-# Lectores de documentos
-from pdfminer.high_level import extract_text as pdf_extract_text
-from docx import Document as DocxDocument
+# La raíz del repo (parse_actas.py) no está en el path cuando se corre este script
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-# Google Sheets (opcional: solo si activás el upload)
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    HAS_GS = True
-except Exception:
-    HAS_GS = False
+# Parser compartido con el modo batch
+from parse_actas import read_pdf_pages, read_docx_bytes, build_dataframe
+import sheets_queue
+import store_actas
+
+# Google Sheets (opcional): la subida va por la cola de sheets_queue
+HAS_GS = find_spec("googleapiclient") is not None and find_spec("google.oauth2") is not None
+
+# El hilo de subida retoma lo que haya quedado en la cola (p.ej. tras un reinicio)
+sheets_queue.get_uploader(sheets_queue.QUEUE_DB)
 
 st.set_page_config(page_title="Extractor de ACTAS → Excel/Sheets", page_icon="🗂️", layout="centered")
 st.title("🗂️ Extractor de ACTAS del Consejo → Excel y Google Sheets")
 
 st.caption("Subí un PDF o DOCX de acta. La app detecta Proyectos, Informes (avance/final), Categorización, Jornadas, Cursos y trabajos para Revista Cuadernos.")
 
-# -------------------- Config (patrones) --------------------
-SECTION_DEFS = [
-    {"name": "Proyectos de investigación", "patterns": [r"Presentación de Proyectos", r"Proyectos de Investigación", r"Proyectos de Convocatoria Abierta"]},
-    {"name": "Proyectos de cátedra",       "patterns": [r"Proyectos de Asignatura", r"Proyectos Cuadernos de Cátedra"]},
-    {"name": "Informes finales",            "patterns": [r"Presentación de Informes Finales", r"Informes Finales"]},
-    {"name": "Informes de avance",          "patterns": [r"Presentación de Informes de Avance", r"Informes de Avance"]},
-    {"name": "Categorización",              "patterns": [r"Solicitud de Categorización", r"Categorizaciones Extraordinarias", r"Categorización de investigadores", r"Categorización de docentes"]},
-    {"name": "Jornadas de investigación",   "patterns": [r"Jornadas de Investigación", r"Jornadas internas de investigación"]},
-    {"name": "Trabajos Revista Cuadernos",  "patterns": [r"Revista Cuadernos", r"Cuadernos de la Secretaría de Investigación", r"presentación de resúmenes", r"trabajos para la revista", r"resúmenes para Cuadernos"]},
-    {"name": "Cursos",                      "patterns": [r"Cursos de capacitación", r"Cursos"]},
-]
-
-FACULTY_HDR = re.compile(r"^(Facultad|Instituto Superior|Vicerrectorado|Escuela)\b.*", re.IGNORECASE)
-ITEM_SPLIT = re.compile(r"\n\s*(?:[\u2022•\-]|[\u25CF\u25A0\u25E6]|\d+\.)\s*")
-
-# -------------------- Utilidades --------------------
-def _norm(s: str) -> str:
-    if s is None:
-        return ""
-    s = s.replace("\x00", " ")
-    s = unicodedata.normalize("NFKC", s)
-    s = s.replace("\xa0", " ")
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{2,}", "\n", s)
-    return s.strip()
-
-def read_pdf_bytes(file_bytes: bytes) -> str:
-    # pdfminer requiere un path o un buffer; usamos BytesIO
-    with io.BytesIO(file_bytes) as bio:
-        text = pdf_extract_text(bio)
-    return _norm(text or "")
-
-def read_docx_bytes(file_bytes: bytes) -> str:
-    with io.BytesIO(file_bytes) as bio:
-        doc = DocxDocument(bio)
-        text = "\n".join(p.text for p in doc.paragraphs)
-    return _norm(text or "")
-
-def find_acta_number(text: str) -> str:
-    m = re.search(r"ACTA\s+N[º°]?\s*([0-9]+)", text, flags=re.IGNORECASE)
-    return m.group(1).strip() if m else ""
-
-def find_date_text(text: str) -> str:
-    m = re.search(r"En la ciudad.*?\n(.*)", text, flags=re.IGNORECASE)
-    if m: return _norm(m.group(1))
-    m2 = re.search(r"a los\s+.+?d[ií]as.*?del mes de\s+.+?\s+de\s+dos mil.*", text, flags=re.IGNORECASE)
-    return _norm(m2.group(0)) if m2 else ""
-
-def split_sections(text: str):
-    named = []
-    for i, sec in enumerate(SECTION_DEFS):
-        pat = "|".join([p for p in sec["patterns"]])
-        named.append(f"(?P<s{i}>\\b(?:{pat})\\b)")
-    if not named:
-        return [("General", 0, len(text))]
-    pattern = re.compile("|".join(named), flags=re.IGNORECASE)
-    hits = []
-    for m in pattern.finditer(text):
-        for i, sec in enumerate(SECTION_DEFS):
-            if m.group(f"s{i}"):
-                hits.append((sec["name"], m.start()))
-                break
-    if not hits:
-        return [("General", 0, len(text))]
-    hits.sort(key=lambda x: x[1])
-    spans = []
-    for i, (name, start) in enumerate(hits):
-        end = hits[i+1][1] if i+1 < len(hits) else len(text)
-        spans.append((name, start, end))
-    return spans
-
-def chunk_by_faculty(section_text: str):
-    lines = [ln.strip() for ln in section_text.split("\n") if ln.strip()]
-    blocks, current, buf = [], None, []
-    for ln in lines:
-        if FACULTY_HDR.match(ln):
-            if buf:
-                blocks.append((current, "\n".join(buf)))
-                buf = []
-            current = ln
-        else:
-            buf.append(ln)
-    if buf:
-        blocks.append((current, "\n".join(buf)))
-    return blocks or [(None, section_text)]
-
-def extract_candidate_items(text: str):
-    parts = ITEM_SPLIT.split("\n" + text)
-    cands = []
-    for p in parts:
-        p = p.strip(" ;\n\t")
-        if len(p) < 6: 
-            continue
-        if re.search(r"(Proyecto|Denominaci[oó]n|PROJOVI|Informe|Categorizaci[oó]n|Baja del proyecto|Revista|Cuadernos|Cursos?)", p, re.IGNORECASE):
-            cands.append(p)
-    return cands or [text.strip()]
-
-def infer_estado(text: str) -> str:
-    t = text.lower()
-    if "baja del proyecto" in t or re.search(r"\bbaja\b", t):
-        return "Baja"
-    if "prórroga" in t or "prorroga" in t:
-        return "Prórroga"
-    if "aprob" in t and ("elev" in t or "enviado" in t):
-        return "Aprobado y elevado"
-    if "aprob" in t:
-        return "Aprobado"
-    if "solicitud de categorización" in t or "solicitud de categorizacion" in t:
-        return "Solicitud"
-    return ""
-
-def infer_destino_publicacion(text: str) -> str:
-    if re.search(r"\b(Cuadernos|revista\s+cuadernos|Cuadernos de la Secretar[ií]a de Investigaci[oó]n)\b", text, re.IGNORECASE):
-        return "Revista Cuadernos"
-    return ""
-
-def extract_title_director(text: str):
-    title, director = None, None
-    m = re.search(r"Proyecto\s*:\s*(.+?)(?:\.\s*Director(?:a)?\s*:\s*([^.]+))?$", text, re.IGNORECASE)
-    if m:
-        title = m.group(1).strip(" .")
-        if m.lastindex and m.lastindex >= 2 and m.group(2):
-            director = m.group(2).strip(" .")
-    if not director:
-        m2 = re.search(r"Director(?:a)?\s*:\s*([^.]+)", text, re.IGNORECASE)
-        if m2:
-            director = m2.group(1).strip(" .")
-    if not title:
-        m3 = re.search(r"Denominaci[oó]n.*?:\s*(.+?)(?:\.|$)", text, re.IGNORECASE)
-        if m3:
-            title = m3.group(1).strip()
-    if not title:
-        m4 = re.search(r"PROJOVI\s*:\s*(.+?)(?:\.|$)", text, re.IGNORECASE)
-        if m4:
-            title = m4.group(1).strip()
-    if not title:
-        m5 = re.search(r"[«“\"']([^\"”»']+)[\"”»']", text)
-        if m5:
-            title = m5.group(1).strip()
-    return title, director
-
-def build_dataframe(text: str, source_name: str) -> pd.DataFrame:
-    acta = find_acta_number(text)
-    fecha = find_date_text(text)
-    sections = split_sections(text)
-    rows = []
-    for sec_name, s, e in sections:
-        chunk = text[s:e].strip()
-        for faculty, block in chunk_by_faculty(chunk):
-            for item in extract_candidate_items(block):
-                title, director = extract_title_director(item)
-                estado = infer_estado(block + " " + item)
-                destino = infer_destino_publicacion(block + " " + item)
-                rows.append({
-                    "Acta": acta,
-                    "Fecha": fecha,
-                    "Facultad": faculty or "",
-                    "Tipo_tema": sec_name,
-                    "Titulo_o_denominacion": (title or item)[:400],
-                    "Director": director or "",
-                    "Estado": estado,
-                    "Destino_publicacion": destino,
-                    "Fuente_archivo": source_name,
-                })
-    df = pd.DataFrame(rows)
-    if df.empty:
-        return df
-    for c in df.columns:
-        df[c] = df[c].astype(str).str.strip()
-    # Orden recomendado
-    df = df[[
-        "Acta","Fecha","Facultad","Tipo_tema","Titulo_o_denominacion",
-        "Director","Estado","Destino_publicacion","Fuente_archivo"
-    ]]
-    return df
-
 # -------------------- UI --------------------
 file = st.file_uploader("Subí el acta (PDF o DOCX)", type=["pdf","docx"])
 col1, col2 = st.columns(2)
 with col1:
-    sheet_name = st.text_input("Nombre del Google Sheet (opcional para subir)", value="Base Consejo de Investigación")
+    try:
+        default_sheet = st.secrets["sheets"]["spreadsheet_id"]
+    except Exception:
+        default_sheet = ""
+    sheet_id = st.text_input("ID del Google Sheet (opcional para subir)", value=default_sheet)
 with col2:
     ws_name = st.text_input("Nombre de la pestaña (worksheet)", value="Actas")
 
 if file is not None:
     suffix = (file.name.split(".")[-1] or "").lower()
     raw = file.read()
+    page_starts = None
     if suffix == "pdf":
-        text = read_pdf_bytes(raw)
+        text, page_starts = read_pdf_pages(raw)
     elif suffix == "docx":
         text = read_docx_bytes(raw)
     else:
@@ -217,13 +50,27 @@ if file is not None:
         st.error("No se pudo leer el archivo.")
         st.stop()
 
-    df = build_dataframe(text, file.name)
+    audit = st.checkbox("Mostrar qué regla de config_patterns.yaml dio cada campo", value=False)
+    df = build_dataframe(text, file.name, page_starts, audit=audit)
     if df.empty:
         st.warning("No se detectaron ítems. Revisá el archivo o los encabezados.")
         st.stop()
 
+    # Base local con todas las actas procesadas (filas + texto, por hash);
+    # una sola vez por archivo aunque Streamlit re-ejecute el script
+    file_hash = hashlib.sha256(raw).hexdigest()
+    if st.session_state.get("guardado") != file_hash:
+        try:
+            store_actas.save_batch([{"hash": file_hash, "archivo": file.name,
+                                     "origen": "Local", "texto": text, "filas": df}])
+            st.session_state["guardado"] = file_hash
+        except Exception as e:
+            st.warning(f"No se pudo guardar en la base local: {e}")
+
     st.success("Extracción completada.")
     st.dataframe(df, use_container_width=True)
+    # La columna de auditoría solo se muestra; no va a Excel ni a Sheets
+    df = df.drop(columns=["Reglas"], errors="ignore")
 
     # Descargar Excel
     st.subheader("Descargar Excel")
@@ -242,27 +89,28 @@ if file is not None:
     st.caption("Requiere configurar credenciales en st.secrets['gcp_service_account'] (JSON).")
     can_upload = HAS_GS and ("gcp_service_account" in st.secrets)
     if not HAS_GS:
-        st.info("Instalá gspread y google-auth (requirements) para habilitar subida a Sheets.")
+        st.info("Instalá google-api-python-client y google-auth (requirements) para habilitar subida a Sheets.")
     elif "gcp_service_account" not in st.secrets:
         st.info("Agregá el secreto 'gcp_service_account' en Settings → Secrets → (contenido JSON de la Service Account).")
-    do_upload = st.checkbox("Subir esta tabla a Google Sheets", value=False, disabled=(not can_upload))
-
-    if do_upload and can_upload:
+    # Se encola: la subida corre en segundo plano (upsert, sin borrar lo de otros)
+    if st.button("Subir esta tabla a Google Sheets", disabled=(not can_upload or not sheet_id)):
         try:
-            scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-            creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=scopes)
-            client = gspread.authorize(creds)
-            try:
-                sh = client.open(sheet_name)
-            except gspread.exceptions.SpreadsheetNotFound:
-                sh = client.create(sheet_name)
-            try:
-                ws = sh.worksheet(ws_name)
-            except gspread.exceptions.WorksheetNotFound:
-                ws = sh.add_worksheet(title=ws_name, rows=1000, cols=20)
-            ws.clear()
-            ws.update([df.columns.tolist()] + df.astype(str).values.tolist())
-            st.success(f"✅ Google Sheets actualizado: {sheet_name} / {ws_name} ({len(df)} filas)")
-            st.caption("Conectá esta hoja a Looker Studio y listo.")
+            st.session_state["subida"] = sheets_queue.enqueue(df, spreadsheet_id=sheet_id, sheet_name=ws_name)
         except Exception as e:
-            st.error(f"Error subiendo a Google Sheets: {e}")
+            st.error(f"Error encolando la subida a Google Sheets: {e}")
+
+    @st.fragment(run_every=3)
+    def upload_status():
+        batch_id = st.session_state.get("subida")
+        if batch_id is None:
+            return
+        lote = sheets_queue.status([batch_id]).iloc[0]
+        if lote["estado"] == sheets_queue.DONE:
+            st.success(f"✅ Google Sheets actualizado: {lote['sheet_name']} ({lote['n_filas']} filas)")
+            st.caption("Conectá esta hoja a Looker Studio y listo.")
+        elif lote["estado"] == sheets_queue.FAILED:
+            st.error(f"Error subiendo a Google Sheets: {lote['error']}")
+        else:
+            st.info(f"⏳ Subida {lote['estado']} (intentos: {lote['intentos']})")
+
+    upload_status()
@@ -3,13 +3,145 @@
 # Extractor de Actas UCCuyo – Document AI + Sheets
 # --------------------------------------------------------
 
+import hashlib
 import io
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import streamlit as st
 import pandas as pd
 
-from extract_actas import process_with_document_ai, extract_text_local
-from upload_to_sheets import upload_dataframe_to_sheet
+from extract_actas import (
+    DocAIUnavailable,
+    RateLimiter,
+    docai_breaker,
+    docai_rate_limiter,
+    get_docai_concurrency,
+    get_docai_resilience,
+    iter_text_local,
+    process_pages_with_document_ai,
+    run_hedged,
+)
+import metrics
+from export_actas import (
+    PARQUET_MIME,
+    XLSX_MIME,
+    clean_excel_df,
+    to_categorical,
+    to_csv_bytes,
+    to_parquet_bytes,
+    to_xlsx_bytes,
+)
+from page_routing import extract_pdf_routed, map_docai_pages, unrouted_report
+from parse_actas import build_dataframe, join_pages
+import store_actas
+import sheets_queue
+import text_store
+
+
+def _process_file(name: str, file_bytes: bytes, limiter: RateLimiter, texts: text_store.TextStore):
+    """
+    Procesa un archivo (se ejecuta en un worker del pool).
+    No llama a st.*: los avisos se devuelven y se muestran en el hilo principal.
+    Los PDF pasan por el ruteo de páginas: solo las páginas sin una capa de
+    texto buena van a Document AI. DOCX y TXT se leen localmente.
+    El texto completo va al text_store de la sesión y se parsea acá mismo: al hilo
+    principal vuelven la referencia, las entidades (con referencias en vez
+    de los textos) y las filas del parser.
+    Devuelve: (nombre, ref_texto, entidades, origen, error, informe_de_ruteo, filas)
+    """
+    name, full_text, df_ent, origin, error, report, page_starts = _extract_file(name, file_bytes, limiter)
+    # Con los inicios de página, cada fila del parser lleva su página
+    rows = build_dataframe(full_text, name, page_starts) if full_text.strip() else None
+    ref, df_ent = text_store.spill(full_text, df_ent, texts)
+    return name, ref, df_ent, origin, error, report, rows
+
+
+def _extract_file(name: str, file_bytes: bytes, limiter: RateLimiter):
+    """
+    Devuelve: (nombre, texto, entidades, origen, error, informe_de_ruteo,
+    inicios_de_página); los inicios son None si el formato no tiene páginas.
+    """
+    unrouted = None
+    if name.lower().endswith(".pdf"):
+        try:
+            full_text, df_ent, report = extract_pdf_routed(file_bytes, rate_limiter=limiter)
+            return name, full_text, df_ent, report["origen"], report["error"], report, report["inicios"]
+        except Exception as e:
+            # No se pudo leer la capa de texto (PDF dañado: pdfminer / pypdf
+            # pueden fallar con cualquier excepción): se manda el PDF entero
+            unrouted = f"{type(e).__name__}: {e}"
+
+    def local(error, reason=None):
+        # error: por qué no se usó Document AI (None = ganó por latencia)
+        if reason is None:
+            reason = f"{type(error).__name__}: {error}" if error is not None else "hedge"
+        buffer = io.BytesIO(file_bytes)
+        buffer.name = name
+        # Una fila TEXTO_COMPLETO por página (PDF) con su número real
+        try:
+            rows = [{
+                "Etiqueta": "TEXTO_COMPLETO",
+                "Valor": text,
+                "Confianza": "",
+                "Página": page
+            } for page, text in iter_text_local(buffer, fallback_reason=reason)]
+        except Exception:
+            if not unrouted:
+                raise
+            rows = []  # PDF ilegible también para pdfminer: queda sin texto
+        full_text, page_starts = join_pages([r["Valor"] for r in rows])
+        if any(r["Página"] == "" for r in rows):
+            page_starts = None  # DOCX / TXT: sin páginas
+        return full_text, pd.DataFrame(rows), page_starts
+
+    if not name.lower().endswith(".pdf"):
+        # DOCX / TXT: el procesador solo acepta PDF e imágenes, se leen local
+        full_text, df_ent, page_starts = local(None, "formato sin Document AI")
+        return name, full_text, df_ent, "Local", None, None, page_starts
+
+    # Document AI con timeout y circuit breaker; local si falla o si tarda
+    # más que el presupuesto ([docai] hedge_after_s)
+    (full_text, df_ent, page_starts), origin, error = run_hedged(
+        lambda: process_pages_with_document_ai(file_bytes, rate_limiter=limiter),
+        local,
+        get_docai_resilience()[3],
+    )
+    if origin == "Document AI":
+        df_ent = map_docai_pages(df_ent)  # 1-based, como en el PDF ruteado
+    report = unrouted_report(unrouted, origin, page_starts, error) if unrouted else None
+    return name, full_text, df_ent, origin, error, report, page_starts
+
+
+@st.fragment(run_every=3)
+def _upload_status():
+    """Estado de las subidas encoladas en esta sesión (se refresca solo)."""
+    ids = st.session_state.get("subidas")
+    if not ids:
+        return
+    try:
+        lotes = sheets_queue.status(ids)
+    except Exception as e:
+        st.warning(f"No se pudo leer la cola de subidas: {e}")
+        return
+    last = lotes.iloc[-1]
+    if last["estado"] == sheets_queue.DONE:
+        st.success(f"✅ Datos subidos correctamente a Google Sheets ({last['n_filas']} filas).")
+    elif last["estado"] == sheets_queue.FAILED:
+        st.error(f"❌ No se pudo subir a Google Sheets. Revisa permisos e IDs.\n\n> {last['error']}")
+    elif last["estado"] == sheets_queue.RUNNING:
+        st.info("⬆️ Subiendo a Google Sheets…")
+    elif last["intentos"]:
+        st.warning(f"⏳ Google Sheets no respondió (intento {last['intentos']}); "
+                   f"se reintenta en {max(last['proximo'] - time.time(), 0):.0f} s.")
+    else:
+        st.info("⏳ En cola para subir a Google Sheets…")
+    if len(lotes) > 1:
+        st.dataframe(lotes[["id", "n_filas", "estado", "intentos", "error"]], use_container_width=True)
+
 
+# El hilo de subida retoma lo que haya quedado en la cola (p.ej. tras un reinicio)
+sheets_queue.get_uploader()
 
 st.set_page_config(page_title="Extractor de Actas – UCCuyo", layout="wide")
 st.title("📑 Extractor de Actas del Consejo de Investigación – UCCuyo")
@@ -28,91 +160,269 @@ uploaded_files = st.file_uploader(
 
 process_btn = st.button("🚀 Procesar")
 
+# Estado de la sesión (sobrevive a los reruns de Streamlit):
+#   archivos: sha256 → resultado ya procesado de ese contenido
+#   hashes:   file_id del uploader → sha256 (no se rehashea en cada rerun)
+#   metrics:  Recorder acumulado de la sesión
+#   textos:   text_store con los textos completos de la sesión (el archivo
+#             se libera cuando se descarta la sesión)
+#   resultado: tabla/vistas/exportaciones de la selección actual
+processed = st.session_state.setdefault("archivos", {})
+file_hashes = st.session_state.setdefault("hashes", {})
+recorder = st.session_state.setdefault("metrics", metrics.Recorder())
+if "textos" not in st.session_state:
+    st.session_state["textos"] = text_store.TextStore()  # crea el archivo: una vez por sesión
+texts = st.session_state["textos"]
+
+
+def _uploaded_keys(files):
+    keys = []
+    for uf in files or []:
+        key = file_hashes.get(uf.file_id)
+        if key is None:
+            key = file_hashes[uf.file_id] = hashlib.sha256(uf.getvalue()).hexdigest()
+        keys.append(key)
+    return keys
+
+
 if process_btn:
     if not uploaded_files:
         st.error("Por favor, subí al menos un archivo.")
         st.stop()
 
-    all_entities = []
-    previews = []
+    keys = _uploaded_keys(uploaded_files)
+    # Solo se procesan los contenidos que la sesión todavía no vio
+    pending, seen = [], set(processed)
+    for key, uf in zip(keys, uploaded_files):
+        if key not in seen:
+            pending.append((key, uf))
+            seen.add(key)
+
+    if pending:
+        with metrics.recording(recorder):
+            # Se leen los bytes en el hilo principal; los workers solo reciben datos
+            with metrics.span("upload_read", files=len(pending)) as sp:
+                files = [(key, uf.name, uf.getvalue()) for key, uf in pending]
+                sp["bytes"] = sum(len(data) for _, _, data in files)
+            max_workers, per_minute = get_docai_concurrency()
+            limiter = docai_rate_limiter(per_minute)
 
-    progress = st.progress(0)
-    for idx, uf in enumerate(uploaded_files, start=1):
-        progress.progress(idx / len(uploaded_files))
+            progress = st.progress(0.0, text=f"0 / {len(files)} archivos procesados")
+            results, failed = [None] * len(files), {}
+            process_file = metrics.bind(_process_file)
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as pool:
+                futures = {
+                    pool.submit(process_file, name, data, limiter, texts): idx
+                    for idx, (_, name, data) in enumerate(files)
+                }
+                for done, fut in enumerate(as_completed(futures), start=1):
+                    # Un archivo que falla no corta la tanda: se avisa y no queda procesado
+                    try:
+                        results[futures[fut]] = fut.result()
+                    except Exception as e:
+                        failed[futures[fut]] = e
+                    progress.progress(done / len(files), text=f"{done} / {len(files)} archivos procesados")
+            del files  # los bytes subidos ya no hacen falta
 
-        file_bytes = uf.read()
-        mime = "application/pdf" if uf.name.lower().endswith(".pdf") else "application/octet-stream"
+        for idx, e in sorted(failed.items()):
+            st.error(f"No se pudo procesar **{pending[idx][1].name}**: {type(e).__name__}: {e}")
+        pending = [p for i, p in enumerate(pending) if i not in failed]
+        results = [r for i, r in enumerate(results) if i not in failed]
 
+        # Base local: texto, entidades y filas del parser, por hash del archivo.
+        # Una sola transacción que consume un generador: cada texto completo se
+        # lee del text_store de la sesión recién al guardarlo (nunca están todos
+        # juntos). Las filas TEXTO_COMPLETO de entidades quedan con el extracto:
+        # el texto ya está en documentos.texto
+        docs = ({
+            "hash": key,
+            "archivo": name,
+            "origen": origin,
+            "texto": texts.get(*ref),
+            "entidades": text_store.drop_refs(df_ent),
+            "filas": rows,
+        } for (key, _), (name, ref, df_ent, origin, _, _, rows) in zip(pending, results))
         try:
-            full_text, df_ent = process_with_document_ai(file_bytes, mime_type=mime)
-            origin = "Document AI"
+            with metrics.recording(recorder):
+                store_actas.save_batch(docs)
         except Exception as e:
-            st.warning(f"No se pudo procesar **{uf.name}** con Document AI. "
-                       f"Se usará extracción local.\n\n> {e}")
-            uf.seek(0)
-            full_text = extract_text_local(uf)
-            df_ent = pd.DataFrame([{
-                "Etiqueta": "TEXTO_COMPLETO",
-                "Valor": full_text,
-                "Confianza": "",
-                "Página": ""
-            }])
-            origin = "Local"
+            st.warning(f"No se pudo guardar en la base local: {e}")
 
-        # Vista previa de texto
-        preview = full_text if len(full_text) <= 3000 else full_text[:3000] + "\n...\n[texto truncado]"
-        previews.append({"Archivo": uf.name, "Origen": origin, "Vista previa": preview})
+        paused = 0
+        for (key, _), (name, ref, df_ent, origin, error, report, _) in zip(pending, results):
+            if isinstance(error, DocAIUnavailable):
+                paused += 1  # un solo aviso para todos (ver estado del breaker)
+            elif error:
+                st.warning(f"No se pudo procesar **{name}** con Document AI. "
+                           f"Se usará extracción local.\n\n> {error}")
+            if report is not None:
+                report["decisiones"].insert(0, "Archivo", name)
+            if not df_ent.empty:
+                df_ent.insert(0, "Archivo", name)
+            with metrics.recording(recorder):
+                df_ent = clean_excel_df(df_ent)
+            # El texto queda en el text_store; acá solo su referencia
+            processed[key] = {"name": name, "origin": origin, "text_ref": ref, "entities": df_ent,
+                              "routing": report}
+        if paused:
+            st.warning(f"Document AI está en pausa: {paused} archivo(s) se extrajeron localmente sin esperar a la API.")
+    else:
+        st.info("Todos los archivos ya estaban procesados en esta sesión.")
+    st.session_state["seleccion"] = keys
 
-        # Añadir columna de archivo
-        if not df_ent.empty:
-            df_ent.insert(0, "Archivo", uf.name)
-        all_entities.append(df_ent)
+# --- Estado del circuit breaker de Document AI (compartido entre sesiones) ---
+breaker = docai_breaker()
+breaker_state = breaker.snapshot()
+if breaker_state["estado"] == breaker.OPEN:
+    st.warning(f"⚡ Document AI en pausa tras {breaker_state['fallas']} fallas seguidas: se usa extracción "
+               f"local. Se vuelve a probar en {breaker_state['reintenta_en_s']:.0f} s.\n\n"
+               f"> {breaker_state['ultimo_error']}")
+elif breaker_state["estado"] == breaker.HALF_OPEN:
+    st.info("⚡ Document AI: probando de nuevo después de una pausa.")
+elif breaker_state["fallas"]:
+    st.caption(f"Document AI: {breaker_state['fallas']} falla(s) reciente(s). Último error: "
+               f"{breaker_state['ultimo_error']}")
 
-    st.subheader("📝 Vista previa del texto")
-    st.dataframe(pd.DataFrame(previews), use_container_width=True)
+# Resultados de los archivos procesados que siguen subidos, en el orden del uploader
+selection = [k for k in st.session_state.get("seleccion", []) if k in processed]
+current = _uploaded_keys(uploaded_files)
+if current:
+    selection = [k for k in dict.fromkeys(current) if k in processed]
 
-    result_df = pd.concat(all_entities, ignore_index=True) if all_entities else pd.DataFrame()
-    st.subheader("🏷️ Etiquetas extraídas")
-    st.dataframe(result_df, use_container_width=True)
-
-    # --- Descarga CSV ---
-    csv_bytes = result_df.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "⬇️ Descargar CSV",
-        data=csv_bytes,
-        file_name="actas_document_ai.csv",
-        mime="text/csv"
-    )
+resultado = st.session_state.get("resultado")
+if selection and (resultado is None or resultado["keys"] != tuple(selection)):
+    entries = [processed[k] for k in selection]
+    frames = [e["entities"] for e in entries if not e["entities"].empty]
+    resultado = st.session_state["resultado"] = {
+        "keys": tuple(selection),
+        "previews": pd.DataFrame([
+            {"Archivo": e["name"], "Origen": e["origin"], "Vista previa": text_store.preview(e["text_ref"], texts)}
+            for e in entries
+        ]),
+        "result_df": pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(),
+        "routing": [e["routing"] for e in entries if e["routing"] is not None],
+        "exports": {},
+        "view": None,
+    }
 
-    # --- Descarga Excel con limpieza de caracteres ilegales ---
-    from io import BytesIO
+if selection and resultado is not None:
+    result_df = resultado["result_df"]
 
-    def clean_excel_text(x):
-        if isinstance(x, str):
-            return "".join(c for c in x if ord(c) in (9, 10, 13) or 32 <= ord(c) <= 126 or 160 <= ord(c))
-        return x
+    st.subheader("📝 Vista previa del texto")
+    st.dataframe(resultado["previews"], use_container_width=True)
 
-    clean_df = result_df.applymap(clean_excel_text)
+    # --- Ruteo de páginas (PDF): qué fue a Document AI y qué se leyó local ---
+    if resultado["routing"]:
+        routing = resultado["routing"]
+        total = sum(r["paginas"] for r in routing)
+        sent = sum(r["docai"] for r in routing)
+        with st.expander(f"🧭 Ruteo de páginas: {sent} de {total} enviadas a Document AI "
+                         f"({total - sent} ahorradas)"):
+            st.dataframe(pd.concat([r["decisiones"] for r in routing], ignore_index=True),
+                         use_container_width=True)
 
-    bio = BytesIO()
-    clean_df.to_excel(bio, index=False, engine="openpyxl")
-    bio.seek(0)
-    st.download_button(
-        "⬇️ Descargar Excel",
-        data=bio,
-        file_name="actas_document_ai.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    st.subheader("🏷️ Etiquetas extraídas")
+    # --- Filtros: sobre la tabla guardada, sin volver a procesar ---
+    view_df = result_df
+    if not result_df.empty:
+        col_f1, col_f2, col_f3 = st.columns(3)
+        sel_files = col_f1.multiselect("Archivo", sorted(result_df["Archivo"].unique()))
+        labels = sorted(result_df["Etiqueta"].unique()) if "Etiqueta" in result_df else []
+        sel_labels = col_f2.multiselect("Etiqueta", labels)
+        query = col_f3.text_input("Contiene")
+        if sel_files:
+            view_df = view_df[view_df["Archivo"].isin(sel_files)]
+        if sel_labels:
+            view_df = view_df[view_df["Etiqueta"].isin(sel_labels)]
+        if query:
+            # En las filas TEXTO_COMPLETO se busca en el texto del text_store
+            view_df = view_df[text_store.contains(view_df, query, texts)]
+        view = (tuple(sel_files), tuple(sel_labels), query)
+    else:
+        view = None
+    if resultado["view"] != view:
+        # Otra vista: las descargas preparadas ya no corresponden
+        resultado["view"], resultado["exports"] = view, {}
+    exports = resultado["exports"]
+    st.caption(f"{len(view_df)} de {len(result_df)} filas")
+    st.dataframe(text_store.drop_refs(view_df), use_container_width=True)
+
+    # --- Descargas: se generan solo cuando se piden (de la vista filtrada),
+    # leyendo los textos completos del text_store de a partes ---
+    def export_parts(df=view_df):
+        return (clean_excel_df(part) for part in text_store.iter_resolved(df, texts))
+
+    col_csv, col_xlsx, col_parquet = st.columns(3)
+    with col_csv:
+        if "csv" not in exports and st.button("📄 Preparar CSV"):
+            with metrics.recording(recorder):
+                exports["csv"] = to_csv_bytes(export_parts())
+        if "csv" in exports:
+            st.download_button(
+                "⬇️ Descargar CSV",
+                data=exports["csv"],
+                file_name="actas_document_ai.csv",
+                mime="text/csv"
+            )
+    with col_xlsx:
+        if "xlsx" not in exports and st.button("📊 Preparar Excel"):
+            with metrics.recording(recorder):
+                exports["xlsx"] = to_xlsx_bytes(export_parts())
+        if "xlsx" in exports:
+            st.download_button(
+                "⬇️ Descargar Excel",
+                data=exports["xlsx"],
+                file_name="actas_document_ai.xlsx",
+                mime=XLSX_MIME
+            )
+    with col_parquet:
+        if "parquet" not in exports and st.button("📦 Preparar Parquet"):
+            with metrics.recording(recorder):
+                exports["parquet"] = to_parquet_bytes(export_parts(to_categorical(view_df)))
+        if "parquet" in exports:
+            st.download_button(
+                "⬇️ Descargar Parquet",
+                data=exports["parquet"],
+                file_name="actas_document_ai.parquet",
+                mime=PARQUET_MIME
+            )
 
     st.divider()
 
-    # --- Subir a Google Sheets ---
+    # --- Subir a Google Sheets: se encola y sube en segundo plano ---
     st.subheader("📤 Subir resultados a Google Sheets")
-    st.caption("Asegurate de que el Google Sheet esté compartido con la cuenta de servicio.")
-    do_upload = st.checkbox("Subir a Google Sheets", value=False)
-    if do_upload:
-        ok = upload_dataframe_to_sheet(clean_df)
-        if ok:
-            st.success("✅ Datos subidos correctamente a Google Sheets.")
-        else:
-            st.error("❌ No se pudo subir a Google Sheets. Revisa permisos e IDs.")
+    st.caption("Asegurate de que el Google Sheet esté compartido con la cuenta de servicio. "
+               "Se sube la tabla completa de los archivos seleccionados (los filtros de arriba "
+               "no se aplican), en segundo plano: podés seguir trabajando.")
+    if st.button("Subir a Google Sheets"):
+        try:
+            # Sin filtros: la hoja reemplaza las filas de cada archivo subido por
+            # las de este lote, así que una vista filtrada borraría las demás
+            full_df = pd.concat(export_parts(result_df), ignore_index=True)
+            st.session_state.setdefault("subidas", []).append(sheets_queue.enqueue(full_df))
+        except Exception as e:
+            st.error(f"❌ No se pudo encolar la subida: {e}")
+    _upload_status()
+
+    # --- Métricas por etapa ---
+    with st.expander("⏱️ Métricas de la sesión"):
+        st.dataframe(pd.DataFrame(recorder.summary()), use_container_width=True)
+        st.caption("Detalle por llamada")
+        st.dataframe(pd.DataFrame(list(recorder.records)), use_container_width=True)
+
+# --- Búsqueda en la base local (todas las actas procesadas) ---
+st.divider()
+st.subheader("🔎 Buscar en actas procesadas")
+col_txt, col_dir, col_fac, col_acta = st.columns(4)
+q_text = col_txt.text_input("Texto libre")
+q_director = col_dir.text_input("Director")
+q_facultad = col_fac.text_input("Facultad")
+q_acta = col_acta.text_input("N° de acta")
+if q_text or q_director or q_facultad or q_acta:
+    try:
+        found = store_actas.search(text=q_text, director=q_director, facultad=q_facultad, acta=q_acta)
+    except Exception as e:
+        st.error(f"No se pudo consultar la base local: {e}")
+    else:
+        st.caption(f"{len(found)} filas")
+        st.dataframe(found.drop(columns=["Hash"]), use_container_width=True)
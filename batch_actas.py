@@ -0,0 +1,250 @@
+# batch_actas.py
+# --------------------------------------------------------
+# Modo batch (sin Streamlit) para el job nocturno de
+# sync.yml: recorre ACTAS_DIR, re-extrae solo los archivos
+# nuevos o modificados y escribe OUTPUT_CSV (con el
+# Proyecto_ID que vincula cada fila entre actas) y, si se
+# pide, un dataset Parquet que solo crece con lo nuevo.
+# --------------------------------------------------------
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import metrics
+from export_actas import remove_parquet_batch, write_parquet_batch
+from parse_actas import build_dataframe, output_columns, read_docx_bytes, read_pdf_pages
+from patterns import config_fingerprint
+from project_linking import PROJECTS_INDEX, link_projects, timeline
+import store_actas
+
+
+ACTAS_DIR = os.environ.get("ACTAS_DIR", "actas")
+OUTPUT_CSV = os.environ.get("OUTPUT_CSV", "actas_extraccion.csv")
+MANIFEST_PATH = os.environ.get("MANIFEST_PATH", os.path.join(".cache", "actas_manifest.json"))
+METRICS_PATH = os.environ.get("METRICS_PATH", os.path.join(".cache", "metrics.jsonl"))
+# Historia por proyecto (una fila por aparición); vacío = no se escribe
+TIMELINE_CSV = os.environ.get("TIMELINE_CSV", "")
+# Dataset Parquet particionado por Acta, un lote por archivo; vacío = no se escribe
+OUTPUT_PARQUET = os.environ.get("OUTPUT_PARQUET", "")
+
+EXTENSIONS = (".pdf", ".docx", ".txt")
+
+# Se incrementa cuando cambia el parser, para forzar una re-extracción completa
+MANIFEST_VERSION = 4
+
+
+# ============= MANIFEST =============
+def load_manifest(path: str) -> dict:
+    """
+    Manifest: {"version": N, "columns": [...], "config": hash, "files": {ruta: entrada}}
+    donde entrada = {"sha256", "size", "mtime_ns", "rows"}.
+    Si no existe, es de otra versión o cambió config_patterns.yaml
+    se empieza de cero.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    config = config_fingerprint()
+    columns = output_columns()
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("columns") != columns
+            or manifest.get("config") != config):
+        manifest = {"version": MANIFEST_VERSION, "columns": columns, "config": config, "files": {}}
+    return manifest
+
+
+def save_manifest(manifest: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_actas(actas_dir: str):
+    """Rutas relativas (orden estable) de los archivos soportados."""
+    out = []
+    for root, _, files in os.walk(actas_dir):
+        for f in files:
+            if f.lower().endswith(EXTENSIONS):
+                out.append(os.path.relpath(os.path.join(root, f), actas_dir))
+    return sorted(out)
+
+
+# ============= EXTRACCIÓN =============
+def read_local_text(path: str, pdf_workers: int = None):
+    """
+    (texto, inicios_de_página); sin páginas para DOCX/TXT.
+    Los PDF se leen por ruta, en paralelo por páginas si son grandes
+    (pdf_workers: ver parse_actas.iter_pdf_pages_parallel).
+    """
+    name = path.lower()
+    if name.endswith(".pdf"):
+        with metrics.span("local_extract", bytes=os.path.getsize(path)) as sp:
+            text, page_starts = read_pdf_pages(path, workers=pdf_workers)
+            sp["pages"] = len(page_starts)
+            return text, page_starts
+    with open(path, "rb") as fh:
+        data = fh.read()
+    with metrics.span("local_extract", bytes=len(data)):
+        if name.endswith(".docx"):
+            return read_docx_bytes(data), None
+        return data.decode("utf-8", errors="ignore"), None
+
+
+def extract_file(path: str, source_name: str, pdf_workers: int = None):
+    """
+    Extracción local + parser para un archivo. Corre en un proceso
+    del pool, por eso recibe la ruta y devuelve solo listas:
+    (filas, texto, spans de métricas).
+    """
+    with metrics.recording() as rec:
+        text, page_starts = read_local_text(path, pdf_workers)
+        rows = []
+        if text.strip():
+            df = build_dataframe(text, source_name, page_starts)
+            if not df.empty:
+                rows = df[output_columns()].values.tolist()
+    for r in rec.records:
+        r["file"] = source_name
+    return rows, text, list(rec.records)
+
+
+def plan_changes(manifest: dict, actas_dir: str, rel_paths):
+    """
+    Devuelve los archivos a re-extraer como [(rel, sha, size, mtime_ns)].
+    Si tamaño y mtime coinciden con el manifest no se rehashea el archivo.
+    """
+    files = manifest["files"]
+    changed = []
+    for rel in rel_paths:
+        full = os.path.join(actas_dir, rel)
+        st_ = os.stat(full)
+        prev = files.get(rel)
+        if prev and prev["size"] == st_.st_size and prev["mtime_ns"] == st_.st_mtime_ns:
+            continue
+        sha = file_sha256(full)
+        if prev and prev["sha256"] == sha:
+            # Mismo contenido (p.ej. checkout nuevo): solo se actualiza el mtime
+            prev["mtime_ns"] = st_.st_mtime_ns
+            continue
+        changed.append((rel, sha, st_.st_size, st_.st_mtime_ns))
+    return changed
+
+
+def run_batch(actas_dir: str = ACTAS_DIR, output_csv: str = OUTPUT_CSV,
+              manifest_path: str = MANIFEST_PATH, workers: int = None,
+              metrics_path: str = METRICS_PATH, db_path: str = None,
+              output_parquet: str = OUTPUT_PARQUET) -> pd.DataFrame:
+    """
+    Corre el batch incremental. Los spans de cada etapa se agregan a
+    metrics_path (JSON lines, uno por span, con el id de la corrida).
+    Los archivos re-extraídos se guardan también en la base local
+    (store_actas, ACTAS_DB) y, con output_parquet, como lotes nuevos del
+    dataset Parquet (los lotes de archivos sin cambios no se tocan).
+    """
+    with metrics.recording() as rec:
+        df = _run_batch(actas_dir, output_csv, manifest_path, workers, rec, db_path, output_parquet)
+    if metrics_path:
+        os.makedirs(os.path.dirname(metrics_path) or ".", exist_ok=True)
+        rec.write_jsonl(metrics_path, run=time.strftime("%Y%m%dT%H%M%S"))
+    for s in rec.summary():
+        print(f"[metrics] {s['etapa']}: {s['n']}x {s['total_ms']:.0f} ms")
+    return df
+
+
+def _parquet_batch_id(sha: str) -> str:
+    # Un lote por contenido de archivo: si el archivo cambia, cambia el lote
+    return sha[:16]
+
+
+def _run_batch(actas_dir, output_csv, manifest_path, workers, rec, db_path=None, output_parquet=""):
+    manifest = load_manifest(manifest_path)
+    rel_paths = list_actas(actas_dir)
+
+    # Archivos borrados del directorio salen del manifest, de la base y del Parquet
+    present = set(rel_paths)
+    removed = [rel for rel in manifest["files"] if rel not in present]
+    for rel in removed:
+        entry = manifest["files"].pop(rel)
+        if output_parquet:
+            remove_parquet_batch(output_parquet, _parquet_batch_id(entry["sha256"]))
+    store_actas.delete_files(removed, db_path)
+    stale_batches = {rel: manifest["files"][rel]["sha256"] for rel in manifest["files"]}
+
+    changed = plan_changes(manifest, actas_dir, rel_paths)
+    print(f"[batch] {len(rel_paths)} archivos, {len(changed)} nuevos o modificados")
+
+    if changed:
+        workers = workers or int(os.environ.get("BATCH_WORKERS", "0")) or os.cpu_count() or 1
+        jobs = [(os.path.join(actas_dir, rel), os.path.basename(rel)) for rel, *_ in changed]
+        if workers > 1 and len(jobs) > 1:
+            # Ya hay un proceso por archivo: sin pools de páginas anidados
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                results = list(pool.map(extract_file, *zip(*jobs), [1] * len(jobs)))
+        else:
+            results = [extract_file(p, n) for p, n in jobs]
+
+        docs = []
+        for (rel, sha, size, mtime_ns), (rows, text, spans) in zip(changed, results):
+            rec.extend(spans)
+            manifest["files"][rel] = {"sha256": sha, "size": size, "mtime_ns": mtime_ns, "rows": rows}
+            docs.append({"hash": sha, "archivo": rel, "origen": "Local", "texto": text,
+                         "filas": pd.DataFrame(rows, columns=manifest["columns"])})
+        # Una sola transacción para toda la tanda; la ruta relativa identifica
+        # al archivo, así que su versión anterior se reemplaza
+        store_actas.save_batch(docs, db_path, replace_archivo=True)
+
+    save_manifest(manifest, manifest_path)
+
+    # Filas cacheadas + nuevas, en el orden de los archivos
+    all_rows = [row for rel in rel_paths for row in manifest["files"][rel]["rows"]]
+    df = pd.DataFrame(all_rows, columns=manifest["columns"])
+    # El índice de proyectos es incremental: las filas ya vistas conservan su ID
+    df = link_projects(df, os.environ.get("PROJECTS_INDEX", PROJECTS_INDEX))
+    if TIMELINE_CSV:
+        timeline(df).to_csv(TIMELINE_CSV, index=False, encoding="utf-8")
+    if output_parquet and changed:
+        # Solo los archivos nuevos o modificados: un lote por archivo
+        offsets, pos = {}, 0
+        for rel in rel_paths:
+            n = len(manifest["files"][rel]["rows"])
+            offsets[rel] = (pos, pos + n)
+            pos += n
+        for rel, sha, *_ in changed:
+            if rel in stale_batches:
+                remove_parquet_batch(output_parquet, _parquet_batch_id(stale_batches[rel]))
+            start, end = offsets[rel]
+            write_parquet_batch(df.iloc[start:end], output_parquet, _parquet_batch_id(sha))
+        print(f"[batch] {len(changed)} lotes Parquet escritos en {output_parquet}")
+    with metrics.span("write_csv", rows=len(df)):
+        df.to_csv(output_csv, index=False, encoding="utf-8")
+    print(f"[batch] {len(df)} filas escritas en {output_csv}")
+    return df
+
+
+def main() -> int:
+    if not os.path.isdir(ACTAS_DIR):
+        print(f"[batch] No existe el directorio {ACTAS_DIR}", file=sys.stderr)
+        return 1
+    run_batch()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
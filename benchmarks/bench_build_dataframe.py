@@ -0,0 +1,97 @@
+# benchmarks/bench_build_dataframe.py
+# --------------------------------------------------------
+# Escalado de build_dataframe con bloques de facultad
+# largos (compilaciones anuales): estado/destino por ítem
+# re-escaneando bloque + ítem (forma anterior, cuadrática)
+# contra rasgos del bloque una vez + rasgos del ítem.
+#
+#   python benchmarks/bench_build_dataframe.py --items 100 1000 4000
+#
+# La forma anterior tarda ~1 min con 4000 ítems; la actual, 0,06 s.
+# --------------------------------------------------------
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import FACULTADES, _item  # noqa: E402
+import parse_actas as pa  # noqa: E402
+from patterns import get_section_matcher  # noqa: E402
+
+
+def long_block_acta(n_items: int, seed: int = 0) -> str:
+    """Un acta con una sola sección y una sola facultad de n_items ítems."""
+    rng = random.Random(seed)
+    matcher = get_section_matcher()
+    lines = ["ACTA Nº 501", "En la ciudad de San Juan,", "a los diez días del mes de mayo de dos mil veintitrés",
+             "Presentación de Proyectos", FACULTADES[0]]
+    while len(lines) < n_items + 5:
+        item = _item(rng)
+        # Sin ítems que contengan un encabezado de sección (cortarían el bloque)
+        if not matcher.find(item):
+            lines.append(item)
+    return "\n".join(lines)
+
+
+def _blocks_items(text):
+    out = []
+    for _, s, e in pa.split_sections(text):
+        for _, block in pa.chunk_by_faculty(text[s:e].strip()):
+            out.append((block, pa.extract_candidate_items(block)))
+    return out
+
+
+def estado_por_item(blocks):
+    """Forma anterior: bloque + ítem completos para cada ítem."""
+    return [(pa.infer_estado(block + " " + item), pa.infer_destino_publicacion(block + " " + item))
+            for block, items in blocks for item in items]
+
+
+def estado_por_bloque(blocks):
+    """Forma actual de build_dataframe: rasgos del bloque una vez, OR con los del ítem."""
+    out = []
+    for block, items in blocks:
+        flags = pa.estado_flags(block)
+        destino = pa.DESTINO_RE.search(block) is not None
+        for item in items:
+            out.append((pa.estado_from_flags(pa.combine_flags(flags, pa.estado_flags(item))),
+                        "Revista Cuadernos" if destino or pa.DESTINO_RE.search(item) else ""))
+    return out
+
+
+def _best(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Escalado de build_dataframe con bloques largos")
+    ap.add_argument("--items", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'ítems':>6} {'por ítem (s)':>13} {'por bloque (s)':>15} {'x':>6} {'build_df (s)':>13} {'µs/ítem':>8}")
+    for n in args.items:
+        text = long_block_acta(n)
+        blocks = _blocks_items(text)
+        old, t_old = _best(estado_por_item, blocks, repeat=args.repeat)
+        new, t_new = _best(estado_por_bloque, blocks, repeat=args.repeat)
+        if old != new:
+            print(f"DIFERENCIA en {n} ítems")
+            return 1
+        df, t_df = _best(pa.build_dataframe, text, "acta_larga.pdf", repeat=args.repeat)
+        print(f"{n:>6} {t_old:>13.4f} {t_new:>15.4f} {t_old / t_new:>6.1f} {t_df:>13.4f} "
+              f"{t_df / max(len(df), 1) * 1e6:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# benchmarks/bench_linking.py
+# --------------------------------------------------------
+# Vinculación de proyectos (project_linking) sobre filas
+# sintéticas: N/4 proyectos que reaparecen con variantes
+# de redacción. Mide filas/s del alta incremental, la
+# recarga del índice y la calidad contra la verdad.
+#
+#   python benchmarks/bench_linking.py --rows 20000 50000
+# --------------------------------------------------------
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from corpus import PREFIJOS, TEMAS, _persona  # noqa: E402
+import project_linking as pl  # noqa: E402
+
+
+SILABAS = ["ma", "to", "ri", "sa", "len", "cor", "vi", "da", "pe", "gran", "no", "ul", "tes", "bio", "fra"]
+LUGARES = ["San Juan", "Cuyo", "Jáchal", "Caucete", "Rivadavia"]
+
+
+def synthetic_rows(n_rows: int, seed: int = 0):
+    """(DataFrame con filas del parser, proyecto real de cada fila)."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4))) for _ in range(400)]
+    projects = [
+        (f"{rng.choice(PREFIJOS)} {rng.choice(TEMAS)} y {' '.join(rng.sample(words, 4))} en {rng.choice(LUGARES)}",
+         _persona(rng))
+        for _ in range(max(1, n_rows // 4))
+    ]
+    rows, truth = [], []
+    for i in range(n_rows):
+        j = rng.randrange(len(projects))
+        title, director = projects[j]
+        v = rng.random()
+        if v < 0.3:
+            title += "."
+        elif v < 0.5:
+            title = title.replace(" en ", " en la ", 1)
+        rows.append({
+            "Acta": str(100 + i // 50),
+            "Fuente_archivo": f"acta_{i // 50}.pdf",
+            "Titulo_o_denominacion": title,
+            "Director": director if rng.random() < 0.5 else "",
+        })
+        truth.append(j)
+    return pd.DataFrame(rows), truth
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de vinculación de proyectos")
+    ap.add_argument("--rows", type=int, nargs="+", default=[5000, 20000])
+    args = ap.parse_args()
+
+    print(f"{'filas':>7} {'alta (s)':>9} {'filas/s':>9} {'recarga (s)':>12} {'proyectos':>10} "
+          f"{'reales':>7} {'mezclados':>10} {'partidos':>9}")
+    for n in args.rows:
+        df, truth = synthetic_rows(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "proyectos.npz")
+            t0 = time.perf_counter()
+            out = pl.link_projects(df, path)
+            t_link = time.perf_counter() - t0
+            # Segunda corrida: todas las filas ya están en el índice
+            t0 = time.perf_counter()
+            again = pl.link_projects(df, path)
+            t_reload = time.perf_counter() - t0
+        if not (again["Proyecto_ID"] == out["Proyecto_ID"]).all():
+            print("Los IDs cambiaron al recargar el índice")
+            return 1
+        g = pd.DataFrame({"p": out["Proyecto_ID"], "t": truth})
+        mixed = int((g.groupby("p")["t"].nunique() > 1).sum())
+        split = int((g.groupby("t")["p"].nunique() > 1).sum())
+        print(f"{n:>7} {t_link:>9.2f} {n / t_link:>9.0f} {t_reload:>12.2f} {out['Proyecto_ID'].nunique():>10} "
+              f"{len(set(truth)):>7} {mixed:>10} {split:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# benchmarks/bench_pdf_parallel.py
+# --------------------------------------------------------
+# Extracción local de un PDF grande (pdfminer) en un solo
+# proceso contra rangos de páginas en paralelo
+# (parse_actas.iter_pdf_pages_parallel), con distintos
+# números de workers. Verifica que el texto sea idéntico.
+#
+#   python benchmarks/bench_pdf_parallel.py --pages 300 --workers 2 4 8
+# --------------------------------------------------------
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_pdf  # noqa: E402
+import parse_actas as pa  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de extracción de PDF en paralelo")
+    ap.add_argument("--pages", type=int, default=300)
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = ap.parse_args()
+
+    data = generate_pdf(args.pages)
+    print(f"{args.pages} páginas, {len(data) / 1e6:.1f} MB, {os.cpu_count()} núcleos")
+
+    t0 = time.perf_counter()
+    serial = list(pa.iter_pdf_pages(data))
+    t_serial = time.perf_counter() - t0
+    print(f"{'workers':>8} {'tiempo (s)':>11} {'páginas/s':>10} {'aceleración':>12}")
+    print(f"{1:>8} {t_serial:>11.2f} {args.pages / t_serial:>10.1f} {1:>11.1f}x")
+
+    for n in args.workers:
+        # Primera pasada levanta el pool (spawn); se mide la segunda
+        list(pa.iter_pdf_pages_parallel(data, workers=n, min_pages=0))
+        t0 = time.perf_counter()
+        pages = list(pa.iter_pdf_pages_parallel(data, workers=n, min_pages=0))
+        t = time.perf_counter() - t0
+        if pages != serial:
+            print(f"El texto con {n} workers no coincide con la lectura en serie")
+            return 1
+        print(f"{n:>8} {t:>11.2f} {args.pages / t:>10.1f} {t_serial / t:>11.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# benchmarks/bench_pipeline.py
+# --------------------------------------------------------
+# Benchmark por etapa del parser y la exportación sobre
+# actas sintéticas (benchmarks/corpus.py) de 1 a 500 págs.
+# Reporta páginas/s, filas/s y pico de memoria por etapa y
+# compara contra benchmarks/baseline.json.
+#
+#   python benchmarks/bench_pipeline.py                  # comparar
+#   python benchmarks/bench_pipeline.py --save-baseline  # actualizar
+# --------------------------------------------------------
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_acta  # noqa: E402
+import export_actas as ex  # noqa: E402
+import parse_actas as pa  # noqa: E402
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [1, 10, 50, 200, 500]
+
+
+# ============= ETAPAS =============
+# Cada etapa recibe el contexto (resultados de las anteriores) y
+# devuelve (resultado, filas_producidas).
+def _stage_norm(ctx):
+    return pa._norm(ctx["raw"]), 0
+
+
+def _stage_split_sections(ctx):
+    return pa.split_sections(ctx["text"]), 0
+
+
+def _stage_chunk_by_faculty(ctx):
+    text = ctx["text"]
+    blocks = [block for _, s, e in ctx["sections"] for _, block in pa.chunk_by_faculty(text[s:e].strip())]
+    return blocks, 0
+
+
+def _stage_extract_candidate_items(ctx):
+    pairs = [(block, item) for block in ctx["blocks"] for item in pa.extract_candidate_items(block)]
+    return pairs, len(pairs)
+
+
+def _stage_extract_fields(ctx):
+    # Todas las reglas de campos del YAML en una pasada por ítem (ver filas/s)
+    return [pa.extract_fields(item) for _, item in ctx["items"]], len(ctx["items"])
+
+
+def _stage_infer_estado(ctx):
+    # Igual que build_dataframe: rasgos del bloque una vez + los del ítem
+    out, last, flags = [], None, None
+    for block, item in ctx["items"]:
+        if block is not last:
+            last, flags = block, pa.estado_flags(block)
+        out.append(pa.estado_from_flags(pa.combine_flags(flags, pa.estado_flags(item))))
+    return out, len(ctx["items"])
+
+
+def _stage_build_dataframe(ctx):
+    df = pa.build_dataframe(ctx["text"], "acta_sintetica.pdf", ctx["page_starts"])
+    return df, len(df)
+
+
+def _stage_export_clean(ctx):
+    df = ex.clean_excel_df(ctx["df"])
+    return df, len(df)
+
+
+def _stage_export_csv(ctx):
+    return ex.to_csv_bytes(ctx["clean"]), len(ctx["clean"])
+
+
+def _stage_export_xlsx(ctx):
+    return ex.to_xlsx_bytes(ctx["clean"]), len(ctx["clean"])
+
+
+def _stage_export_parquet(ctx):
+    return ex.to_parquet_bytes(ctx["clean"]), len(ctx["clean"])
+
+
+# (nombre, función, clave donde se guarda el resultado en el contexto)
+STAGES = [
+    ("norm", _stage_norm, "text"),
+    ("split_sections", _stage_split_sections, "sections"),
+    ("chunk_by_faculty", _stage_chunk_by_faculty, "blocks"),
+    ("extract_candidate_items", _stage_extract_candidate_items, "items"),
+    ("extract_fields", _stage_extract_fields, None),
+    ("infer_estado", _stage_infer_estado, None),
+    ("build_dataframe", _stage_build_dataframe, "df"),
+    ("export_clean", _stage_export_clean, "clean"),
+    ("export_csv", _stage_export_csv, None),
+    ("export_xlsx", _stage_export_xlsx, None),
+    ("export_parquet", _stage_export_parquet, None),
+]
+
+
+def _time_stage(fn, ctx, repeat):
+    best = float("inf")
+    result = rows = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result, rows = fn(ctx)
+        best = min(best, time.perf_counter() - t0)
+    return result, rows, best
+
+
+def _peak_stage(fn, ctx):
+    gc.collect()
+    tracemalloc.start()
+    fn(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(sizes, repeat=3, seed=0, stages=None):
+    """{str(páginas): {etapa: {"seconds", "rows", "pages_per_s", "rows_per_s", "peak_kb"}}}"""
+    results = {}
+    for pages in sizes:
+        text, page_starts = generate_acta(pages, seed)
+        # Texto "crudo" como lo entrega pdfminer: espacios dobles y saltos de más
+        ctx = {"raw": text.replace(" ", "  ").replace("\n", "\n\n"), "page_starts": page_starts}
+        per_stage = {}
+        for name, fn, key in STAGES:
+            if stages and name not in stages:
+                # Igual se calcula el resultado si otra etapa lo necesita
+                if key:
+                    ctx[key] = fn(ctx)[0]
+                continue
+            result, rows, seconds = _time_stage(fn, ctx, repeat)
+            peak = _peak_stage(fn, ctx)
+            if key:
+                ctx[key] = result
+            per_stage[name] = {
+                "seconds": round(seconds, 6),
+                "rows": rows,
+                "pages_per_s": round(pages / seconds, 1) if seconds else None,
+                "rows_per_s": round(rows / seconds, 1) if seconds and rows else None,
+                "peak_kb": round(peak / 1024, 1),
+            }
+        results[str(pages)] = per_stage
+    return results
+
+
+# ============= BASELINE =============
+def compare(current, baseline, tolerance):
+    """Lista de regresiones (tiempo o memoria) por encima de la tolerancia."""
+    regressions = []
+    for size, stages in current.items():
+        for name, cur in stages.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            # Por debajo de 10 ms el ruido domina: no se compara tiempo
+            if base["seconds"] >= 0.01 and cur["seconds"] > base["seconds"] * (1 + tolerance):
+                regressions.append(f"{size}p {name}: {base['seconds']:.4f}s → {cur['seconds']:.4f}s")
+            if base["peak_kb"] >= 64 and cur["peak_kb"] > base["peak_kb"] * (1 + tolerance):
+                regressions.append(f"{size}p {name}: {base['peak_kb']:.0f} KB → {cur['peak_kb']:.0f} KB")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'págs':>5} {'etapa':<24} {'seg':>9} {'págs/s':>10} {'filas/s':>10} {'pico KB':>10}")
+    for size, stages in results.items():
+        for name, r in stages.items():
+            print(f"{size:>5} {name:<24} {r['seconds']:>9.4f} {r['pages_per_s'] or 0:>10.1f} "
+                  f"{r['rows_per_s'] or 0:>10.1f} {r['peak_kb']:>10.1f}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark por etapa del parser de actas")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="páginas por acta")
+    ap.add_argument("--stages", nargs="+", help="solo estas etapas")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--tolerance", type=float, default=0.5, help="regresión permitida (0.5 = 50%%)")
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--json", help="escribir los resultados en este archivo")
+    args = ap.parse_args()
+
+    results = run(args.sizes, args.repeat, args.seed, set(args.stages or []))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        print(f"Baseline guardado en {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("Sin baseline: correr con --save-baseline")
+        return 0
+    with open(BASELINE_PATH, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    regressions = compare(results, baseline, args.tolerance)
+    for r in regressions:
+        print(f"REGRESIÓN {r}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# benchmarks/check_sheets_upsert.py
+# --------------------------------------------------------
+# Verifica el upsert de upload_to_sheets contra el servidor
+# de fake_sheets.py (sin credenciales ni red): varias rondas
+# de altas, cambios y bajas, comparando el contenido final
+# de la hoja con lo esperado y contando las escrituras. Una
+# ronda sin cambios no debe escribir nada.
+#
+#   python benchmarks/check_sheets_upsert.py [--rows 1200]
+# --------------------------------------------------------
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_sheets import serve  # noqa: E402
+
+
+SPREADSHEET_ID, SHEET_NAME = "planilla-prueba", "Actas"
+COLUMNS = ["Acta", "Fecha", "Facultad", "Tipo_tema", "Titulo_o_denominacion",
+           "Director", "Estado", "Destino_publicacion", "Fuente_archivo"]
+ESTADOS = ["Aprobado", "Pendiente", "Observado"]
+
+
+def _rows(n: int, archivos: int, seed: int = 7):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        archivo = f"acta_{i % archivos:03d}.pdf"
+        rows.append([str(100 + i % archivos), "2024-05-10", f"Facultad {i % 5}", "Proyecto",
+                     f"Proyecto {i} sobre tema {rng.randint(1, 10**6)}", f"Director {i % 37}",
+                     rng.choice(ESTADOS), "", archivo])
+    # Un título repetido en el mismo archivo (n° de ocurrencia en la clave)
+    rows.append(list(rows[0]))
+    return rows
+
+
+def _sorted(rows):
+    return sorted(map(tuple, rows))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Upsert a Google Sheets contra un servidor falso")
+    ap.add_argument("--rows", type=int, default=1200)
+    ap.add_argument("--files", type=int, default=12)
+    args = ap.parse_args()
+
+    server, fake, endpoint = serve()
+    # upload_to_sheets usa el servidor local, sin credenciales (ver _get_service)
+    os.environ["SHEETS_API_ENDPOINT"] = endpoint
+    import upload_to_sheets as up
+
+    failures = []
+
+    def upload(values, delete_missing=False):
+        before = len(fake.writes)
+        up.upload_values(COLUMNS, values, SPREADSHEET_ID, SHEET_NAME, delete_missing=delete_missing)
+        return fake.writes[before:]
+
+    def check(name, writes, expected, max_rows=None, ordered=False):
+        # ordered: además, cada fila en su lugar (cambios sin mover filas)
+        sheet = fake.rows(SPREADSHEET_ID, SHEET_NAME)
+        ok = sheet[:1] == [COLUMNS] and _sorted(sheet[1:]) == _sorted(expected)
+        if ordered:
+            ok = ok and sheet[1:] == [list(r) for r in expected]
+        touched = sum(w["filas"] for w in writes)
+        if max_rows is not None and touched > max_rows:
+            ok = False
+        print(f"{name:<34} operaciones: {len(writes):>3} | filas escritas: {touched:>5} | "
+              f"hoja: {len(sheet) - 1:>5} filas | {'OK' if ok else 'FALLA'}")
+        if not ok:
+            failures.append(name)
+
+    try:
+        rows = _rows(args.rows, args.files)
+        # 1) Hoja nueva: no hay encabezado con qué comparar, se escribe entera
+        check("1) carga inicial", upload(rows), rows, ordered=True)
+
+        # 2) Los mismos datos: ninguna escritura
+        writes = upload(rows)
+        check("2) sin cambios", writes, rows, max_rows=0)
+        if writes:
+            failures.append("2) sin cambios: hubo escrituras")
+
+        # 3) Cambia el Estado de algunas filas: solo esas (en su lugar)
+        changed = [list(r) for r in rows]
+        for r in changed[::50]:
+            r[6] = "Baja"
+        n_changed = len(changed[::50])
+        writes = upload(changed)
+        check("3) estado modificado", writes, changed, max_rows=n_changed, ordered=True)
+
+        # 4) Un archivo nuevo y otro con menos filas (las que faltan se borran);
+        #    los archivos que no vienen en la tanda no se tocan
+        target = "acta_003.pdf"
+        batch = [r for r in changed if r[8] == target][:-3]
+        extra = [["999", "2024-06-01", "Facultad 1", "Curso", f"Curso {i}", "Director X",
+                  "Aprobado", "", "acta_nueva.pdf"] for i in range(3)]
+        expected = [r for r in changed if r[8] != target] + batch + extra
+        check("4) altas y bajas por archivo", upload(batch + extra), expected, max_rows=6)
+
+        # 5) Base completa con delete_missing: la hoja queda igual a la tanda
+        final = [r for r in expected if r[8] not in ("acta_000.pdf", "acta_007.pdf")]
+        check("5) base completa (delete_missing)", upload(final, delete_missing=True), final,
+              max_rows=len(expected) - len(final))
+
+        # 6) Y de nuevo sin cambios
+        writes = upload(final, delete_missing=True)
+        check("6) sin cambios (delete_missing)", writes, final, max_rows=0)
+        if writes:
+            failures.append("6) sin cambios: hubo escrituras")
+    finally:
+        server.shutdown()
+
+    if failures:
+        print(f"FALLA: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
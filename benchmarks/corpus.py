@@ -0,0 +1,178 @@
+# benchmarks/corpus.py
+# --------------------------------------------------------
+# Generador reproducible (con semilla) de actas sintéticas
+# para los benchmarks: encabezado con N° de acta y fecha,
+# secciones de config_patterns.yaml, bloques por facultad
+# e ítems con "Proyecto:/Director:", informes, bajas, etc.
+# --------------------------------------------------------
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from patterns import get_config  # noqa: E402
+
+
+LINES_PER_PAGE = 45
+
+FACULTADES = [
+    "Facultad de Ciencias Médicas",
+    "Facultad de Derecho y Ciencias Sociales",
+    "Facultad de Ciencias Económicas y Empresariales",
+    "Facultad de Filosofía y Humanidades",
+    "Facultad de Ciencias Químicas y Tecnológicas",
+    "Facultad de Educación",
+    "Instituto Superior de Formación Docente",
+    "Escuela de Enfermería",
+    "Vicerrectorado de Investigación",
+]
+
+TEMAS = [
+    "diabetes tipo 2", "salud mental en adolescentes", "derecho ambiental",
+    "economía regional", "vitivinicultura sustentable", "educación inclusiva",
+    "inteligencia artificial en la docencia", "minería y comunidad",
+    "patrimonio histórico sanjuanino", "energía solar distribuida",
+    "calidad del agua en el Valle de Tulum", "bioética clínica",
+    "alfabetización digital", "turismo rural", "violencia de género",
+]
+PREFIJOS = ["Estudio de", "Análisis de", "Impacto de", "Evaluación de", "Relevamiento de", "Aportes sobre"]
+NOMBRES = ["Juan", "María", "Ana", "Carlos", "Lucía", "Pedro", "Sofía", "Martín", "Laura", "Diego"]
+APELLIDOS = ["Pérez", "Gómez", "Fernández", "López", "Díaz", "Martínez", "Rodríguez", "Sánchez", "Romero", "Torres"]
+TITULOS = ["Dr.", "Dra.", "Mg.", "Lic.", "Esp."]
+NUMEROS = ["uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez"]
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+         "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+
+def _persona(rng):
+    return f"{rng.choice(TITULOS)} {rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}"
+
+
+def _titulo(rng):
+    return f"{rng.choice(PREFIJOS)} {rng.choice(TEMAS)} en {rng.choice(['San Juan', 'Cuyo', 'la región', 'la provincia'])}"
+
+
+def _item(rng):
+    bullet = rng.choice(["- ", "• ", f"{rng.randint(1, 30)}. "])
+    kind = rng.random()
+    if kind < 0.35:
+        return f"{bullet}Proyecto: {_titulo(rng)}. Director{rng.choice(['', 'a'])}: {_persona(rng)}"
+    if kind < 0.5:
+        return (f"{bullet}Informe {rng.choice(['de avance', 'final'])} del proyecto "
+                f"«{_titulo(rng)}». Se aprueba y se eleva al Consejo Superior.")
+    if kind < 0.6:
+        return f"{bullet}Denominación del proyecto: {_titulo(rng)}. Directora: {_persona(rng)}"
+    if kind < 0.67:
+        return f"{bullet}PROJOVI: {_titulo(rng)}."
+    if kind < 0.74:
+        return f"{bullet}Baja del proyecto «{_titulo(rng)}» por renuncia del director."
+    if kind < 0.8:
+        return f"{bullet}Solicitud de prórroga del proyecto «{_titulo(rng)}»."
+    if kind < 0.87:
+        return f"{bullet}Solicitud de Categorización de {_persona(rng)}."
+    if kind < 0.93:
+        return f"{bullet}Trabajo «{_titulo(rng)}» para la Revista Cuadernos, autor {_persona(rng)}."
+    return f"{bullet}Cursos de posgrado sobre {rng.choice(TEMAS)} a cargo de {_persona(rng)}."
+
+
+def _section_headings():
+    sections = get_config().data.get("sections") or []
+    return [p for sec in sections for p in sec.get("patterns") or []]
+
+
+def generate_acta_pages(pages: int, seed: int = 0):
+    """Lista de páginas (cada una un str con ~LINES_PER_PAGE líneas)."""
+    rng = random.Random(seed)
+    headings = _section_headings()
+    lines = [
+        f"ACTA Nº {rng.randint(100, 999)}",
+        "En la ciudad de San Juan, Universidad Católica de Cuyo,",
+        f"a los {rng.choice(NUMEROS)} días del mes de {rng.choice(MESES)} de dos mil {rng.choice(['veinte', 'veintiuno', 'veintidós', 'veintitrés'])}, "
+        "se reúne el Consejo de Investigación.",
+    ]
+    total = pages * LINES_PER_PAGE
+    while len(lines) < total:
+        lines.append(rng.choice(headings))
+        for _ in range(rng.randint(1, 4)):
+            lines.append(rng.choice(FACULTADES))
+            # Algunas facultades traen listados largos (compilaciones anuales)
+            n_items = rng.randint(40, 120) if rng.random() < 0.1 else rng.randint(2, 12)
+            for _ in range(n_items):
+                lines.append(_item(rng))
+        if rng.random() < 0.3:
+            lines.append("Se pasa a tratar el siguiente punto del orden del día.")
+    lines = lines[:total]
+    return ["\n".join(lines[i:i + LINES_PER_PAGE]) for i in range(0, total, LINES_PER_PAGE)]
+
+
+def generate_acta(pages: int, seed: int = 0):
+    """(texto, inicios_de_página) como los devuelve parse_actas.read_pdf_pages."""
+    parts = generate_acta_pages(pages, seed)
+    starts, pos = [], 0
+    for p in parts:
+        starts.append(pos)
+        pos += len(p) + 1
+    return "\n".join(parts), starts
+
+
+def _pdf_str(s: str) -> bytes:
+    raw = s.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def make_pdf(pages) -> bytes:
+    """
+    PDF mínimo (Helvetica, una línea por renglón) con una página por
+    elemento de `pages`; alcanza para medir la extracción con pdfminer.
+    """
+    objs = []
+
+    def add(body: bytes) -> int:
+        objs.append(body)
+        return len(objs)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = add(b"")
+    kids = []
+    for text in pages:
+        ops = b" ".join(_pdf_str(ln[:110]) + b" Tj T*" for ln in text.split("\n"))
+        stream = b"BT /F1 9 Tf 11 TL 40 810 Td " + ops + b" ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        ))
+    objs[pages_id - 1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids)
+                          + b"] /Count %d >>" % len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    return bytes(out)
+
+
+def generate_pdf(pages: int, seed: int = 0) -> bytes:
+    return make_pdf(generate_acta_pages(pages, seed))
+
+
+if __name__ == "__main__":
+    # python benchmarks/corpus.py 20 acta.pdf → escribe un acta sintética
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    out = sys.argv[2] if len(sys.argv) > 2 else f"acta_sintetica_{n}p.pdf"
+    if out.lower().endswith(".pdf"):
+        data = generate_pdf(n)
+        with open(out, "wb") as fh:
+            fh.write(data)
+    else:
+        with open(out, "w", encoding="utf-8") as fh:
+            fh.write(generate_acta(n)[0])
+    print(f"{out}: {n} páginas")
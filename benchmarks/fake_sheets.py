@@ -0,0 +1,193 @@
+# benchmarks/fake_sheets.py
+# --------------------------------------------------------
+# Servidor local que imita la parte de la API de Google
+# Sheets v4 que usa upload_to_sheets (get, batchUpdate con
+# addSheet / deleteDimension / appendCells, values.get,
+# values.batchUpdate, values.clear, values.update). Guarda
+# las hojas en memoria y cuenta las escrituras, para probar
+# el upsert sin credenciales:
+#
+#   python benchmarks/fake_sheets.py --port 8765
+#   SHEETS_API_ENDPOINT=http://127.0.0.1:8765/ python upload_to_sheets.py
+# --------------------------------------------------------
+
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+_PATH = re.compile(r"^/v4/spreadsheets/(?P<sid>[^/:]+)(?P<rest>.*)$")
+# 'Hoja'!A5, Hoja!A:ZZ, 'Hoja'!A1 → (hoja, fila inicial 0-based)
+_RANGE = re.compile(r"^'?(?P<sheet>.*?)'?!(?P<col>[A-Z]+)(?P<row>\d*)(?::[A-Z]+\d*)?$")
+
+
+def _parse_range(a1: str):
+    m = _RANGE.match(a1)
+    if not m:
+        raise ValueError(f"rango no soportado: {a1}")
+    if m["col"] != "A":
+        raise ValueError(f"solo rangos desde la columna A: {a1}")
+    return m["sheet"].replace("''", "'"), int(m["row"]) - 1 if m["row"] else 0
+
+
+def _trim(row):
+    # La API real no devuelve las celdas vacías del final
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class FakeSheets:
+    """
+    Estado del servidor: {spreadsheet_id: {título: {"id", "rows"}}} y el
+    registro de escrituras ({"metodo", "filas"} por llamada que modifica).
+    Las planillas se crean vacías en el primer acceso.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.books = {}
+        self.writes = []
+
+    def rows(self, spreadsheet_id: str, sheet_name: str):
+        """Contenido actual de la hoja (filas sin las celdas vacías del final)."""
+        with self.lock:
+            sheet = self.books.get(spreadsheet_id, {}).get(sheet_name)
+            return [_trim(r) for r in sheet["rows"]] if sheet else []
+
+    def _sheet(self, sid, title):
+        book = self.books.setdefault(sid, {})
+        if title not in book:
+            raise KeyError(f"no existe la hoja {title!r}")
+        return book[title]
+
+    def _by_id(self, sid, sheet_id):
+        for sheet in self.books.setdefault(sid, {}).values():
+            if sheet["id"] == sheet_id:
+                return sheet
+        raise KeyError(f"no existe sheetId {sheet_id}")
+
+    def _put_rows(self, sheet, start, values):
+        rows = sheet["rows"]
+        while len(rows) < start + len(values):
+            rows.append([])
+        for i, row in enumerate(values):
+            rows[start + i] = [str(v) for v in row]
+
+    # --- Endpoints (method, resto de la ruta) ---
+    def handle(self, method, sid, rest, body):
+        with self.lock:
+            book = self.books.setdefault(sid, {})
+            if method == "GET" and rest == "":
+                return {"spreadsheetId": sid, "sheets": [
+                    {"properties": {"title": t, "sheetId": s["id"]}} for t, s in book.items()]}
+            if method == "POST" and rest == ":batchUpdate":
+                return {"spreadsheetId": sid, "replies": [self._request(sid, r) for r in body["requests"]]}
+            if method == "POST" and rest == "/values:batchUpdate":
+                n = 0
+                for d in body["data"]:
+                    title, start = _parse_range(d["range"])
+                    self._put_rows(self._sheet(sid, title), start, d["values"])
+                    n += len(d["values"])
+                self.writes.append({"metodo": "values.batchUpdate", "filas": n})
+                return {"spreadsheetId": sid, "totalUpdatedRows": n}
+            if rest.startswith("/values/"):
+                a1 = rest[len("/values/"):]
+                if method == "POST" and a1.endswith(":clear"):
+                    title, _ = _parse_range(a1[:-len(":clear")])
+                    self._sheet(sid, title)["rows"] = []
+                    self.writes.append({"metodo": "values.clear", "filas": 0})
+                    return {"spreadsheetId": sid}
+                title, start = _parse_range(a1)
+                sheet = self._sheet(sid, title)
+                if method == "GET":
+                    rows = [_trim(r) for r in sheet["rows"][start:]]
+                    while rows and not rows[-1]:
+                        rows.pop()
+                    return {"range": a1, "values": rows} if rows else {"range": a1}
+                if method == "PUT":
+                    self._put_rows(sheet, start, body["values"])
+                    self.writes.append({"metodo": "values.update", "filas": len(body["values"])})
+                    return {"spreadsheetId": sid, "updatedRows": len(body["values"])}
+        raise KeyError(f"{method} {rest or '/'} no soportado")
+
+    def _request(self, sid, req):
+        (kind, spec), = req.items()
+        if kind == "addSheet":
+            book = self.books[sid]
+            title = spec["properties"]["title"]
+            sheet_id = max((s["id"] for s in book.values()), default=0) + 1
+            book[title] = {"id": sheet_id, "rows": []}
+            self.writes.append({"metodo": "addSheet", "filas": 0})
+            return {"addSheet": {"properties": {"title": title, "sheetId": sheet_id}}}
+        if kind == "deleteDimension":
+            r = spec["range"]
+            assert r["dimension"] == "ROWS"
+            sheet = self._by_id(sid, r["sheetId"])
+            del sheet["rows"][r["startIndex"]:r["endIndex"]]
+            self.writes.append({"metodo": "deleteDimension", "filas": r["endIndex"] - r["startIndex"]})
+            return {}
+        if kind == "appendCells":
+            sheet = self._by_id(sid, spec["sheetId"])
+            while sheet["rows"] and not _trim(sheet["rows"][-1]):
+                sheet["rows"].pop()
+            for row in spec["rows"]:
+                sheet["rows"].append([c["userEnteredValue"]["stringValue"] for c in row["values"]])
+            self.writes.append({"metodo": "appendCells", "filas": len(spec["rows"])})
+            return {}
+        raise KeyError(f"request {kind} no soportado")
+
+
+def _handler(state: FakeSheets):
+    class Handler(BaseHTTPRequestHandler):
+        def _serve(self):
+            url = urlsplit(self.path)
+            m = _PATH.match(unquote(url.path))
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            try:
+                if not m:
+                    raise KeyError(url.path)
+                status, payload = 200, state.handle(self.command, m["sid"], m["rest"], body)
+            except (KeyError, ValueError) as e:
+                status, payload = 400, {"error": {"code": 400, "message": str(e), "status": "INVALID_ARGUMENT"}}
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = _serve
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port: int = 0):
+    """
+    Arranca el servidor en un hilo; devuelve (server, estado, endpoint).
+    server.shutdown() lo detiene.
+    """
+    state = FakeSheets()
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(state))
+    threading.Thread(target=server.serve_forever, name="fake-sheets", daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Servidor local que imita Google Sheets v4")
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+    server, _, endpoint = serve(args.port)
+    print(f"[fake_sheets] {endpoint} (Ctrl+C para salir)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,98 @@
+# benchmarks/import_budget.py
+# --------------------------------------------------------
+# Presupuesto de tiempo de import (arranque en frío y
+# reruns de Streamlit). Importa los módulos de la app en
+# un proceso limpio, mide el tiempo y verifica que las
+# dependencias pesadas NO se hayan cargado todavía.
+#
+#   python benchmarks/import_budget.py [--budget-ms 1500]
+# --------------------------------------------------------
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_MODULES = [
+    "extract_actas",
+    "upload_to_sheets",
+    "parse_actas",
+    "export_actas",
+    "docai_cache",
+    "patterns",
+    "store_actas",
+    "page_routing",
+    "sheets_queue",
+    "text_store",
+]
+
+# Solo deben cargarse al procesar / subir, nunca al abrir la página
+HEAVY_MODULES = [
+    "google.cloud.documentai_v1",
+    "googleapiclient.discovery",
+    "google.oauth2.service_account",
+    "pdfminer.high_level",
+    "pdfminer.pdfinterp",
+    "docx",
+    "openpyxl",
+    "gspread",
+    "pypdf",
+]
+
+# Tiempo total permitido para importar los módulos de la app (incluye
+# streamlit y pandas, que se cargan siempre)
+DEFAULT_BUDGET_MS = 1500
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit, pandas
+t1 = time.perf_counter()
+for m in {modules!r}:
+    __import__(m)
+t2 = time.perf_counter()
+print(json.dumps({{
+    "base_ms": (t1 - t0) * 1000,
+    "app_ms": (t2 - t1) * 1000,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure() -> dict:
+    code = _PROBE.format(modules=APP_MODULES, heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Presupuesto de tiempo de import de la app")
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    # Mejor de N corridas para no medir ruido del disco / caché del SO
+    results = [measure() for _ in range(args.runs)]
+    best = min(results, key=lambda r: r["base_ms"] + r["app_ms"])
+    total = best["base_ms"] + best["app_ms"]
+    print(f"streamlit+pandas: {best['base_ms']:.0f} ms | módulos app: {best['app_ms']:.0f} ms "
+          f"| total: {total:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+
+    ok = True
+    if best["loaded"]:
+        print(f"FALLA: dependencias pesadas importadas al inicio: {', '.join(best['loaded'])}")
+        ok = False
+    if total > args.budget_ms:
+        print("FALLA: se superó el presupuesto de import")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# docai_cache.py
+# --------------------------------------------------------
+# Caché persistente en disco para los resultados de
+# Document AI. La clave es el SHA-256 del archivo más
+# project/location/processor (y la versión del procesador),
+# así una misma acta no se vuelve a facturar.
+# --------------------------------------------------------
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+
+DEFAULT_DIR = os.environ.get("DOCAI_CACHE_DIR", os.path.join(".cache", "docai"))
+DEFAULT_MAX_MB = float(os.environ.get("DOCAI_CACHE_MAX_MB", "512"))
+
+# Se incrementa si cambia el formato de lo guardado
+_FORMAT = 1
+
+
+def cache_key(file_bytes: bytes, project_id: str, location: str,
+              processor_id: str, processor_version: str = "") -> str:
+    """
+    Clave de contenido: SHA-256 de los bytes del archivo + procesador.
+    Cambiar processor_version invalida todas las entradas anteriores.
+    """
+    h = hashlib.sha256()
+    h.update(file_bytes)
+    for part in (project_id, location, processor_id, processor_version, str(_FORMAT)):
+        h.update(b"\x1f")
+        h.update(str(part or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+class DocAICache:
+    """
+    Guarda (full_text, entidades, inicios de página) como JSON comprimido con gzip,
+    un archivo por clave. La eviction es LRU por tamaño: cada
+    lectura actualiza el mtime y, al superar max_bytes, se borran
+    primero las entradas usadas hace más tiempo.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIR, max_mb: float = DEFAULT_MAX_MB):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def get(self, key: str):
+        """
+        Devuelve (full_text, df_entities, page_starts) o None si no está en caché.
+        page_starts es None en entradas guardadas antes de que existiera.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                payload = json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Entrada corrupta (p.ej. escritura cortada): se descarta
+            self._remove(path)
+            return None
+
+        if payload.get("v") != _FORMAT:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path, None)  # marca de uso para el LRU
+        except OSError:
+            pass
+
+        ent = payload.get("entities") or {}
+        df_entities = pd.DataFrame(ent.get("data", []), columns=ent.get("columns", []))
+        return payload.get("full_text", ""), df_entities, payload.get("page_starts")
+
+    def put(self, key: str, full_text: str, df_entities: pd.DataFrame, page_starts=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = {
+            "v": _FORMAT,
+            "full_text": full_text or "",
+            "entities": {
+                "columns": list(df_entities.columns),
+                "data": df_entities.astype(object).where(df_entities.notna(), None).values.tolist(),
+            },
+            "page_starts": page_starts,
+        }
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as fh:
+            json.dump(payload, fh, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        self._evict()
+
+    def clear(self):
+        """Invalida todo el caché (p.ej. tras reentrenar el procesador)."""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        out = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for f in os.scandir(shard.path):
+                if f.name.endswith(".json.gz"):
+                    try:
+                        st_ = f.stat()
+                    except OSError:
+                        continue
+                    out.append((f.path, st_.st_mtime, st_.st_size))
+        return out
+
+    def _evict(self):
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, _, size in entries)
+            if total <= self.max_bytes:
+                return
+            entries.sort(key=lambda e: e[1])  # más viejo primero
+            for path, _, size in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+
+
+def get_cache() -> DocAICache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DocAICache()
+    return _default_cache
@@ -0,0 +1,210 @@
+# export_actas.py
+# --------------------------------------------------------
+# Exportación de resultados a CSV / Excel / Parquet:
+# limpieza de caracteres ilegales columna por columna con
+# un regex compilado, xlsx con openpyxl en modo write-only
+# y Parquet con columnas categóricas (pyarrow).
+# --------------------------------------------------------
+
+import glob
+import io
+import os
+import re
+
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+from metrics import span
+
+
+# Excel no acepta caracteres de control: se conservan \t \n \r,
+# ASCII imprimible (32–126) y todo desde 160 en adelante.
+EXCEL_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]")
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+# Pocas categorías distintas: en Parquet van como diccionario (un código
+# entero por fila) y al leer vuelven como dtype "category"
+CATEGORY_COLUMNS = (
+    "Facultad", "Tipo_tema", "Estado", "Destino_publicacion", "Fuente_archivo",
+    "Etiqueta", "Archivo", "Origen",
+)
+
+
+def clean_excel_text(x):
+    """Versión escalar de la limpieza (para valores sueltos)."""
+    if isinstance(x, str):
+        return EXCEL_ILLEGAL.sub("", x)
+    return x
+
+
+def clean_excel_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Quita los caracteres ilegales para Excel columna por columna.
+    Solo se tocan columnas de texto; los valores no-str se conservan.
+    """
+    with span("export_clean", rows=len(df)):
+        out = df.copy(deep=False)
+        for col in out.columns:
+            s = out[col]
+            if s.dtype != object:
+                continue
+            kind = infer_dtype(s, skipna=True)
+            if kind == "string":
+                out[col] = s.str.replace(EXCEL_ILLEGAL, "", regex=True).where(s.notna(), s)
+            elif kind.startswith("mixed"):
+                is_str = s.map(type).eq(str)
+                out[col] = s.where(~is_str, s[is_str].str.replace(EXCEL_ILLEGAL, "", regex=True))
+        return out
+
+
+def _frames(df):
+    # Un DataFrame o un iterable de partes con las mismas columnas
+    # (p.ej. text_store.iter_resolved, que lee los textos de a partes)
+    return [df] if isinstance(df, pd.DataFrame) else df
+
+
+def to_csv_bytes(df) -> bytes:
+    with span("export_csv") as sp:
+        bio, rows = io.BytesIO(), 0
+        for i, part in enumerate(_frames(df)):
+            part.to_csv(bio, index=False, header=i == 0, encoding="utf-8")
+            rows += len(part)
+        sp["rows"], sp["bytes"] = rows, bio.tell()
+        return bio.getvalue()
+
+
+def to_xlsx_bytes(df, sheet_name: str = "Actas") -> bytes:
+    """
+    Escribe el xlsx en modo write-only de openpyxl (filas en streaming,
+    sin armar el modelo de celdas completo). df (o cada parte) ya debe
+    estar limpio.
+    """
+    from openpyxl import Workbook
+
+    with span("export_xlsx") as sp:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=sheet_name)
+        rows = 0
+        for i, part in enumerate(_frames(df)):
+            if i == 0:
+                ws.append([str(c) for c in part.columns])
+            for row in part.itertuples(index=False, name=None):
+                ws.append([None if isinstance(v, float) and v != v else v for v in row])
+            rows += len(part)
+        bio = io.BytesIO()
+        wb.save(bio)
+        sp["rows"], sp["bytes"] = rows, bio.tell()
+        return bio.getvalue()
+
+
+def to_categorical(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas de CATEGORY_COLUMNS como "category"; el resto de las columnas
+    de texto con tipos mezclados (p.ej. Confianza "" / 0.93) pasa a str,
+    que es lo que Arrow necesita para armar una columna.
+    """
+    out = df.copy(deep=False)
+    for col in out.columns:
+        s = out[col]
+        if col in CATEGORY_COLUMNS:
+            out[col] = s.astype("category")
+        elif s.dtype == object and infer_dtype(s, skipna=True) not in ("string", "empty"):
+            out[col] = s.astype(str).where(s.notna(), None)
+    return out
+
+
+def to_parquet_bytes(df) -> bytes:
+    """
+    Parquet en memoria; con partes, un row group por parte. Las partes
+    deben tener los mismos dtypes (tramos de una tabla ya pasada por
+    to_categorical): el esquema es el de la primera, con las columnas
+    sin datos como texto.
+    """
+    if isinstance(df, pd.DataFrame):
+        with span("export_parquet", rows=len(df)) as sp:
+            bio = io.BytesIO()
+            to_categorical(df).to_parquet(bio, engine="pyarrow", index=False, compression="zstd")
+            sp["bytes"] = bio.tell()
+            return bio.getvalue()
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with span("export_parquet") as sp:
+        bio, writer, schema, rows = io.BytesIO(), None, None, 0
+        for part in df:
+            data = to_categorical(part)
+            if writer is None:
+                schema = pa.Schema.from_pandas(data, preserve_index=False)
+                for i, field in enumerate(schema):
+                    if pa.types.is_null(field.type):
+                        schema = schema.set(i, field.with_type(pa.string()))
+                writer = pq.ParquetWriter(bio, schema, compression="zstd")
+            writer.write_table(pa.Table.from_pandas(data, schema=schema, preserve_index=False))
+            rows += len(part)
+        if writer is not None:
+            writer.close()
+        sp["rows"], sp["bytes"] = rows, bio.tell()
+        return bio.getvalue()
+
+
+def _partitioning(partition_col: str):
+    # Explícita como texto: si no, al leer "Acta=123" se infiere como entero
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([(partition_col, pa.string())]), flavor="hive")
+
+
+def _batch_files(base_dir: str, batch_id: str):
+    return glob.glob(os.path.join(base_dir, "*", f"{batch_id}-*.parquet"))
+
+
+def write_parquet_batch(df: pd.DataFrame, base_dir: str, batch_id: str, partition_col: str = "Acta"):
+    """
+    Agrega un lote al dataset Parquet de base_dir, particionado por
+    `partition_col` (base_dir/Acta=123/<batch_id>-0.parquet). No reescribe
+    lotes anteriores; si ya había uno con el mismo batch_id se reemplaza.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    with span("export_parquet", rows=len(df)) as sp:
+        remove_parquet_batch(base_dir, batch_id)
+        if df.empty:
+            return
+        data = to_categorical(df)
+        data[partition_col] = data[partition_col].astype(str).replace("", "sin_dato")
+        ds.write_dataset(
+            pa.Table.from_pandas(data, preserve_index=False),
+            base_dir,
+            format="parquet",
+            partitioning=_partitioning(partition_col),
+            basename_template=f"{batch_id}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        )
+        sp["files"] = len(_batch_files(base_dir, batch_id))
+
+
+def remove_parquet_batch(base_dir: str, batch_id: str):
+    for path in _batch_files(base_dir, batch_id):
+        os.remove(path)
+        try:
+            os.rmdir(os.path.dirname(path))  # partición que quedó vacía
+        except OSError:
+            pass
+
+
+def read_parquet(base_dir: str, columns=None, filters=None, partition_col: str = "Acta") -> pd.DataFrame:
+    """
+    Lee el dataset (o un archivo) leyendo solo `columns`; `filters` al
+    estilo pyarrow, p.ej. [("Acta", "in", ["120", "121"])], poda particiones.
+    """
+    with span("read_parquet") as sp:
+        kwargs = {"partitioning": _partitioning(partition_col)} if os.path.isdir(base_dir) else {}
+        df = pd.read_parquet(base_dir, engine="pyarrow", columns=columns, filters=filters, **kwargs)
+        sp["rows"] = len(df)
+        return df
@@ -5,55 +5,349 @@
 # + fallback local para PDF/DOCX cuando haga falta.
 # --------------------------------------------------------
 
-import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
 
-from google.cloud import documentai_v1 as documentai
-from google.oauth2 import service_account
+# google-cloud-documentai y google-auth se importan
+# recién en el primer uso (ver benchmarks/import_budget.py)
+from parse_actas import iter_pdf_pages_parallel, read_docx_bytes
+from metrics import bind, span
+from resources import cached_resource, get_gcp_credentials
+
+from docai_cache import cache_key, get_cache
+
+
+# ============= CLIENTES / CUOTA =============
+_client_pool = queue.LifoQueue()
+
+
+@contextmanager
+def docai_client():
+    """
+    Presta un DocumentProcessorServiceClient del pool del proceso.
+    Cada worker concurrente usa su propio cliente y lo devuelve al
+    terminar, así los clientes se reutilizan entre archivos y corridas.
+    """
+    try:
+        client = _client_pool.get_nowait()
+    except queue.Empty:
+        from google.cloud import documentai_v1 as documentai
+        client = documentai.DocumentProcessorServiceClient(credentials=get_gcp_credentials())
+    try:
+        yield client
+    finally:
+        _client_pool.put(client)
+
+
+class RateLimiter:
+    """
+    Limita las llamadas a N por minuto repartiéndolas en el tiempo
+    (una cada 60/N segundos). Es seguro entre hilos.
+    """
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute and per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+@cached_resource
+def docai_rate_limiter(per_minute: float) -> RateLimiter:
+    """
+    Limitador compartido por todos los hilos y sesiones del proceso: la
+    cuota es del procesador, no de cada clic en "Procesar".
+    """
+    return RateLimiter(per_minute)
+
+
+def get_docai_concurrency():
+    """
+    (max_workers, requests_per_minute) desde [docai] en secrets.
+    Valores por defecto: 4 workers y 120 solicitudes/minuto.
+    """
+    try:
+        conf = st.secrets["docai"]
+    except Exception:
+        conf = {}
+    return int(conf.get("max_workers", 4)), float(conf.get("requests_per_minute", 120))
+
+
+def get_docai_resilience():
+    """
+    (timeout_s, fallas_para_abrir, pausa_s, presupuesto_s) desde [docai]:
+    timeout por llamada (60 s), fallas seguidas que abren el breaker (3),
+    cuánto queda abierto antes de probar de nuevo (120 s) y, si es > 0,
+    a los cuántos segundos sin respuesta se arranca la extracción local en
+    paralelo (hedge_after_s; 0 = desactivado).
+    """
+    try:
+        conf = st.secrets["docai"]
+    except Exception:
+        conf = {}
+    return (float(conf.get("timeout_s", 60)), int(conf.get("breaker_failures", 3)),
+            float(conf.get("breaker_cooldown_s", 120)), float(conf.get("hedge_after_s", 0)))
+
+
+# ============= CIRCUIT BREAKER =============
+class DocAIUnavailable(RuntimeError):
+    """Document AI en pausa por el circuit breaker: no se llamó a la API."""
+
+
+class CircuitBreaker:
+    """
+    Corta las llamadas a Document AI tras `failures` fallas seguidas:
+    - cerrado: todo pasa;
+    - abierto: falla al instante (DocAIUnavailable) durante `cooldown` s;
+    - medio abierto: deja pasar una sola llamada de prueba; si anda se
+      cierra, si falla vuelve a abrirse.
+    Es seguro entre hilos y uno solo se comparte en el proceso (docai_breaker).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "cerrado", "abierto", "medio abierto"
+
+    def __init__(self, failures: int = 3, cooldown: float = 120.0):
+        self.failures = max(1, failures)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._count = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._last_error = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._state, self._trial = self.HALF_OPEN, False
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state, self._count, self._trial = self.CLOSED, 0, False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self._count += 1
+            self._last_error = f"{type(error).__name__}: {error}"[:200]
+            if self._state == self.HALF_OPEN or self._count >= self.failures:
+                self._state, self._opened_at, self._trial = self.OPEN, time.monotonic(), False
 
-from pdfminer.high_level import extract_text as pdf_extract_text
-from docx import Document as DocxDocument
+    def snapshot(self) -> dict:
+        """Estado para la UI / métricas."""
+        with self._lock:
+            retry_in = max(self.cooldown - (time.monotonic() - self._opened_at), 0.0)
+            return {
+                "estado": self._state,
+                "fallas": self._count,
+                "reintenta_en_s": round(retry_in, 1) if self._state == self.OPEN else 0.0,
+                "ultimo_error": self._last_error,
+            }
 
 
-# ============= CREDENCIALES =============
-def get_gcp_credentials(scopes=None):
+def is_outage(error: Exception) -> bool:
     """
-    Carga credenciales desde Streamlit Secrets.
-    Debes haber pegado tu JSON en:
-      [gcp_service_account]
-      ...
+    True si el error dice que el servicio no está disponible para nadie
+    (caído, saturado, sin cuota, sin red o credenciales rechazadas): solo
+    esos cuentan para el breaker. Un error del archivo (InvalidArgument,
+    NotFound...) no.
     """
-    creds = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"]
+    from google.api_core import exceptions as api
+    from google.auth import exceptions as auth
+
+    # DeadlineExceeded es un GatewayTimeout y ResourceExhausted un TooManyRequests
+    outage = (
+        api.ServiceUnavailable, api.InternalServerError, api.BadGateway, api.GatewayTimeout,
+        api.TooManyRequests, api.Unauthenticated, api.PermissionDenied, api.RetryError,
+        auth.TransportError, auth.RefreshError, ConnectionError, TimeoutError,
     )
-    if scopes:
-        creds = creds.with_scopes(scopes)
-    return creds
+    return isinstance(error, outage)
+
+
+@cached_resource
+def docai_breaker() -> CircuitBreaker:
+    """Breaker compartido por todos los archivos, hilos y sesiones del proceso."""
+    _, failures, cooldown, _ = get_docai_resilience()
+    return CircuitBreaker(failures, cooldown)
+
+
+# ============= HEDGING =============
+@cached_resource
+def _hedge_pool(max_workers: int):
+    # Por cada archivo en curso: la llamada remota y la local, y lugar para
+    # las remotas que perdieron y siguen hasta su timeout
+    return ThreadPoolExecutor(max_workers=3 * max(1, max_workers), thread_name_prefix="docai-hedge")
+
+
+def run_hedged(remote, local, budget: float = 0):
+    """
+    Corre remote() y, si falla, local(error). Con budget > 0, si a los
+    `budget` s remote no respondió arranca local(None) en paralelo y se queda
+    con lo primero que termine bien. Devuelve (resultado, "Document AI" | "Local", error):
+    error es la excepción de remote, o un TimeoutError si ganó local por
+    latencia. Solo lanza si fallan las dos (la de local, encadenada a la de
+    remote). La llamada remota que pierde sigue hasta su timeout y, si
+    termina, queda en el caché para la próxima vez.
+    """
+    if not budget or budget <= 0:
+        # Sin hedging: remote en este mismo hilo (sin pasar por el pool)
+        try:
+            return remote(), "Document AI", None
+        except Exception as error:
+            try:
+                return local(error), "Local", error
+            except Exception as local_error:
+                raise local_error from error
+
+    pool = _hedge_pool(get_docai_concurrency()[0])
+    started = threading.Event()
+
+    def run_remote():
+        started.set()
+        return remote()
+
+    fut_remote = pool.submit(bind(run_remote))
+    started.wait()  # la espera en la cola del pool no cuenta para el presupuesto
+    done, _ = wait([fut_remote], timeout=budget)
+    if done:
+        error = fut_remote.exception()
+        if error is None:
+            return fut_remote.result(), "Document AI", None
+        try:
+            return local(error), "Local", error
+        except Exception as local_error:
+            raise local_error from error
+    fut_local = pool.submit(bind(local), None)
+    pending = {fut_remote, fut_local}
+    while pending:
+        # Lo primero que termine bien; si local falla se sigue esperando a remote
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if fut_remote in done and fut_remote.exception() is None:
+            return fut_remote.result(), "Document AI", None
+        if fut_local in done and fut_local.exception() is None:
+            error = fut_remote.exception() if fut_remote.done() else None
+            return fut_local.result(), "Local", error or TimeoutError(f"Document AI sin respuesta en {budget:g} s")
+    raise fut_local.exception() from fut_remote.exception()
 
 
 # ============= DOCUMENT AI =============
-def process_with_document_ai(file_bytes: bytes, mime_type: str = "application/pdf"):
+def process_with_document_ai(file_bytes: bytes, mime_type: str = "application/pdf",
+                             use_cache: bool = True, client=None, rate_limiter: RateLimiter = None):
     """
     Procesa un archivo con tu Custom Extractor de Document AI.
     Lee project/location/processor desde [docai] en secrets.
+    Si [docai] define processor_version, se usa esa versión y
+    las entradas de caché de otras versiones quedan invalidadas.
+    client: cliente ya creado (p.ej. de docai_client()); si falta,
+    se toma uno del pool. rate_limiter: se respeta solo cuando hay
+    que llamar a la API (los aciertos de caché no consumen cuota).
     Devuelve: (texto_completo, dataframe_de_entidades)
     """
+    full_text, df_entities, _ = process_pages_with_document_ai(
+        file_bytes, mime_type, use_cache, client, rate_limiter
+    )
+    return full_text, df_entities
+
+
+def process_pages_with_document_ai(file_bytes: bytes, mime_type: str = "application/pdf",
+                                   use_cache: bool = True, client=None, rate_limiter: RateLimiter = None):
+    """
+    Igual que process_with_document_ai pero devuelve también los inicios de
+    página: (texto_completo, entidades, page_starts), donde page_starts[i]
+    es el offset en el texto donde empieza la página i+1 del archivo enviado
+    (None si la entrada de caché es anterior a este dato).
+    """
+    with span("docai", bytes=len(file_bytes)) as sp:
+        full_text, df_entities, page_starts, sp["cache"], sp["pages"] = _run_document_ai(
+            file_bytes, mime_type, use_cache, client, rate_limiter
+        )
+        sp["rows"] = len(df_entities)
+        return full_text, df_entities, page_starts
+
+
+def _page_starts(doc):
+    # Offset del primer segmento de texto de cada página del documento
+    starts = []
+    for page in doc.pages or []:
+        segments = page.layout.text_anchor.text_segments
+        if segments:
+            starts.append(int(segments[0].start_index or 0))
+        else:
+            starts.append(starts[-1] if starts else 0)  # página sin texto
+    return starts
+
+
+def _run_document_ai(file_bytes, mime_type, use_cache, client, rate_limiter):
+    # Devuelve (texto, entidades, inicios de página, "hit"/"miss"/"off", páginas procesadas)
     project_id  = st.secrets["docai"]["project_id"]
     location    = st.secrets["docai"]["location"]
     processor_id= st.secrets["docai"]["processor_id"]
+    processor_version = st.secrets["docai"].get("processor_version", "")
+
+    # Primero el caché en disco: mismo archivo + mismo procesador = mismo resultado
+    key = cache_key(file_bytes, project_id, location, processor_id, processor_version)
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            return (*cached, "hit", None)
 
-    creds = get_gcp_credentials()
-    client = documentai.DocumentProcessorServiceClient(credentials=creds)
     name = f"projects/{project_id}/locations/{location}/processors/{processor_id}"
+    if processor_version:
+        name += f"/processorVersions/{processor_version}"
+
+    # Falla rápido si Document AI viene fallando (no se espera cuota ni timeout)
+    breaker = docai_breaker()
+    if not breaker.allow():
+        state = breaker.snapshot()
+        raise DocAIUnavailable(f"Document AI en pausa ({state['fallas']} fallas seguidas; "
+                               f"se reintenta en {state['reintenta_en_s']:.0f} s): {state['ultimo_error']}")
 
-    raw_document = documentai.RawDocument(content=file_bytes, mime_type=mime_type)
-    request = documentai.ProcessRequest(name=name, raw_document=raw_document)
-    result = client.process_document(request=request)
+    from google.cloud import documentai_v1 as documentai
+
+    timeout, *_ = get_docai_resilience()
+    try:
+        raw_document = documentai.RawDocument(content=file_bytes, mime_type=mime_type)
+        request = documentai.ProcessRequest(name=name, raw_document=raw_document)
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        if client is None:
+            with docai_client() as pooled:
+                result = pooled.process_document(request=request, timeout=timeout)
+        else:
+            result = client.process_document(request=request, timeout=timeout)
+    except Exception as e:
+        if is_outage(e):
+            breaker.record_failure(e)
+        else:
+            breaker.record_success()  # la API respondió: el problema es el archivo
+        raise
+    breaker.record_success()
     doc = result.document
 
     # Texto completo del documento
     full_text = doc.text or ""
+    page_starts = _page_starts(doc)
 
     # Entidades etiquetadas por tu Custom Extractor
     rows = []
@@ -73,32 +367,56 @@ def process_with_document_ai(file_bytes: bytes, mime_type: str = "application/pd
         })
 
     df_entities = pd.DataFrame(rows)
-    return full_text, df_entities
+    if use_cache:
+        try:
+            get_cache().put(key, full_text, df_entities, page_starts)
+        except OSError:
+            pass  # sin caché no se pierde el resultado
+    return full_text, df_entities, page_starts, "miss" if use_cache else "off", len(doc.pages)
 
 
 # ============= FALLBACK LOCAL =============
-def extract_text_local(uploaded_file):
+def iter_text_local(uploaded_file, fallback_reason: str = None):
     """
-    Si Document AI no está disponible, extrae texto local:
-    - PDF con pdfminer.six
-    - DOCX con python-docx
+    Si Document AI no está disponible, extrae texto local como
+    (página, texto) — la página es "" cuando el formato no tiene:
+    - PDF con pdfminer.six, página por página
+    - DOCX leyendo word/document.xml en streaming (incluye tablas)
     - TXT como texto plano
+    fallback_reason: por qué no se usó Document AI (queda en las métricas).
     """
     name = uploaded_file.name.lower()
+    data = uploaded_file.read()
+
+    with span("local_extract", bytes=len(data), pages=0, fallback_reason=fallback_reason) as sp:
+        for page, text in _iter_local_bytes(name, data):
+            sp["pages"] += 1
+            yield page, text
 
+
+def _iter_local_bytes(name: str, data: bytes):
     if name.endswith(".pdf"):
-        # pdfminer necesita un path o un buffer binario
-        data = uploaded_file.read()
-        buffer = io.BytesIO(data)
-        text = pdf_extract_text(buffer)
-        return text
+        # PDF grandes: rangos de páginas en paralelo (PDF_WORKERS)
+        yield from iter_pdf_pages_parallel(data)
+        return
 
     if name.endswith(".docx"):
-        data = uploaded_file.read()
-        buffer = io.BytesIO(data)
-        doc = DocxDocument(buffer)
-        text = "\n".join(p.text for p in doc.paragraphs)
-        return text
+        # Párrafos y filas de tabla en orden, leyendo el XML en streaming
+        yield "", read_docx_bytes(data)
+        return
 
     # Texto plano u otros
-    return uploaded_file.read().decode("utf-8", errors="ignore")
+    yield "", data.decode("utf-8", errors="ignore")
+
+
+def extract_text_local(uploaded_file):
+    """Texto local completo (ver iter_text_local)."""
+    return "\n".join(text for _, text in iter_text_local(uploaded_file))
+
+
+# ============= MODO BATCH =============
+if __name__ == "__main__":
+    # python extract_actas.py → procesa ACTAS_DIR de forma incremental
+    import sys
+    from batch_actas import main
+    sys.exit(main())
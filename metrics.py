@@ -0,0 +1,140 @@
+# metrics.py
+# --------------------------------------------------------
+# Instrumentación liviana por etapa: spans con duración y
+# atributos (bytes, páginas, filas, motivo de fallback).
+# Cuesta un perf_counter y un append por span, así que
+# puede quedar activada en producción.
+# --------------------------------------------------------
+
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Recorder:
+    """Acumula los spans de una corrida (thread-safe)."""
+
+    def __init__(self, maxlen: int = None):
+        self.records = deque(maxlen=maxlen) if maxlen else []
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+
+    def extend(self, records):
+        with self._lock:
+            self.records.extend(records)
+
+    def summary(self):
+        """
+        Totales por etapa: [{etapa, n, total_ms, max_ms, errores, bytes, pages, rows}],
+        ordenado por tiempo total descendente.
+        """
+        agg = {}
+        with self._lock:
+            records = list(self.records)
+        for r in records:
+            a = agg.setdefault(r["name"], {
+                "etapa": r["name"], "n": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "errores": 0, "bytes": 0, "pages": 0, "rows": 0,
+            })
+            a["n"] += 1
+            a["total_ms"] += r["ms"]
+            a["max_ms"] = max(a["max_ms"], r["ms"])
+            a["errores"] += r["status"] != "ok"
+            for k in ("bytes", "pages", "rows"):
+                v = r.get(k)
+                if isinstance(v, (int, float)):
+                    a[k] += v
+        out = sorted(agg.values(), key=lambda a: a["total_ms"], reverse=True)
+        for a in out:
+            a["total_ms"] = round(a["total_ms"], 1)
+            a["max_ms"] = round(a["max_ms"], 1)
+        return out
+
+    def write_jsonl(self, path: str, **extra):
+        """Agrega los spans a `path`, uno por línea (extra se suma a cada uno)."""
+        with self._lock:
+            records = list(self.records)
+        with open(path, "a", encoding="utf-8") as fh:
+            for r in records:
+                fh.write(json.dumps({**extra, **r}, ensure_ascii=False, default=str) + "\n")
+
+
+# Spans fuera de una corrida explícita van a un buffer acotado
+_default = Recorder(maxlen=1000)
+_current = contextvars.ContextVar("metrics_recorder", default=None)
+
+
+def current() -> Recorder:
+    return _current.get() or _default
+
+
+@contextmanager
+def recording(rec: Recorder = None):
+    """
+    Los spans dentro del bloque (y de las funciones ligadas con bind) van
+    a `rec`, o a un Recorder nuevo si no se pasa (p.ej. para seguir
+    sumando spans de una corrida guardada en st.session_state).
+    """
+    rec = rec if rec is not None else Recorder()
+    token = _current.set(rec)
+    try:
+        yield rec
+    finally:
+        _current.reset(token)
+
+
+def bind(fn):
+    """
+    Liga fn al Recorder actual, para usarla en un ThreadPoolExecutor
+    (los hilos del pool no heredan el contexto).
+    """
+    rec = current()
+
+    def wrapper(*args, **kwargs):
+        token = _current.set(rec)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Mide el bloque y registra {name, ts, ms, status, ...attrs}.
+    Devuelve el dict de atributos para completarlo adentro:
+        with span("docai", bytes=len(data)) as sp:
+            ...
+            sp["pages"] = n
+    """
+    rec = current()
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except GeneratorExit:
+        # Generador que no se consumió hasta el final: no es un error
+        attrs.setdefault("stopped", True)
+        raise
+    except BaseException as e:
+        status = "error"
+        attrs.setdefault("error", f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        if status == "ok" and "error" in attrs:
+            status = "error"  # error manejado adentro del bloque
+        rec.add({
+            "name": name,
+            "ts": round(time.time(), 3),
+            "ms": round((time.perf_counter() - t0) * 1000, 3),
+            "status": status,
+            **attrs,
+        })
@@ -0,0 +1,202 @@
+# page_routing.py
+# --------------------------------------------------------
+# Ruteo de páginas de un PDF entre extracción local y
+# Document AI: las páginas con una capa de texto buena se
+# leen con pdfminer (gratis) y solo las escaneadas o de
+# mala calidad se mandan a Document AI, juntas en un PDF
+# reducido armado con pypdf.
+# --------------------------------------------------------
+
+import io
+import os
+import re
+
+import pandas as pd
+
+from extract_actas import get_docai_resilience, process_pages_with_document_ai, run_hedged
+from metrics import span
+from parse_actas import iter_pdf_pages_parallel, join_pages
+
+
+# Umbrales de la capa de texto (por página)
+ROUTING_MIN_CHARS = int(os.environ.get("ROUTING_MIN_CHARS", "120"))
+ROUTING_MIN_WORD_RATIO = float(os.environ.get("ROUTING_MIN_WORD_RATIO", "0.6"))
+# PAGE_ROUTING=0 manda siempre el PDF completo a Document AI
+PAGE_ROUTING = os.environ.get("PAGE_ROUTING", "1") != "0"
+
+# Palabra "legible": letras (con acentos) o números, con puntuación pegada
+_WORD_OK = re.compile(r"^[(¿¡\"'«]*(?:[A-Za-zÁÉÍÓÚÜÑáéíóúüñ]{2,}|[0-9][0-9.,/º°-]*)[)?!.,;:\"'»]*$")
+# Glifos sin mapa a Unicode: pdfminer los escribe como "(cid:123)"
+_CID = re.compile(r"\(cid:\d+\)")
+
+
+def text_quality(text: str):
+    """
+    (buena, motivo) para la capa de texto de una página.
+    Mala si tiene poco texto (escaneada), glifos sin mapa de caracteres o
+    una proporción baja de palabras legibles (OCR embebido ruidoso).
+    """
+    cids = len(_CID.findall(text))
+    if cids > 5:
+        return False, f"{cids} glifos sin mapa de caracteres"
+    chars = sum(1 for c in text if not c.isspace())
+    if chars < ROUTING_MIN_CHARS:
+        return False, f"poco texto ({chars} caracteres)"
+    words = text.split()
+    ratio = sum(1 for w in words if _WORD_OK.match(w)) / max(len(words), 1)
+    if ratio < ROUTING_MIN_WORD_RATIO:
+        return False, f"texto ilegible ({ratio:.0%} palabras válidas)"
+    return True, "capa de texto"
+
+
+def plan_pages(file_bytes: bytes):
+    """
+    Lee la capa de texto de cada página y decide su destino.
+    Devuelve [{"Página", "Destino", "Motivo", "texto"}] en orden.
+    """
+    plan = []
+    for page, text in iter_pdf_pages_parallel(file_bytes):
+        ok, reason = text_quality(text)
+        plan.append({"Página": page, "Destino": "Local" if ok else "Document AI",
+                     "Motivo": reason, "texto": text})
+    return plan
+
+
+def subset_pdf(file_bytes: bytes, pages) -> bytes:
+    """PDF nuevo solo con `pages` (números 1-based, en ese orden)."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(file_bytes))
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(reader.pages[page - 1])
+    bio = io.BytesIO()
+    writer.write(bio)
+    return bio.getvalue()
+
+
+def map_docai_pages(df_docai: pd.DataFrame, pages=None) -> pd.DataFrame:
+    """
+    "Página" de las entidades de Document AI (índice 0-based dentro del PDF
+    enviado) → número real (1-based) en el PDF original. pages: números de
+    las páginas enviadas, en orden (None = se mandó el PDF entero).
+    """
+    if df_docai.empty or "Página" not in df_docai:
+        return df_docai
+
+    def number(i):
+        if pd.isna(i) or i == "":
+            return ""
+        i = int(i)
+        if pages is None:
+            return i + 1 if i >= 0 else ""
+        return pages[i] if 0 <= i < len(pages) else ""
+
+    df_docai = df_docai.copy()
+    df_docai["Página"] = [number(i) for i in df_docai["Página"]]
+    return df_docai
+
+
+def unrouted_report(reason: str, origin: str, page_starts, error=None):
+    """
+    Informe con el formato de extract_pdf_routed para un PDF que no se pudo
+    rutear (se procesó entero): una sola decisión con el motivo.
+    """
+    pages = len(page_starts or ())
+    sent = pages if origin == "Document AI" else 0
+    return {
+        "origen": origin,
+        "paginas": pages,
+        "locales": 0,
+        "docai": sent,
+        "ahorro": pages - sent,
+        "decisiones": pd.DataFrame([{"Página": "", "Destino": origin, "Motivo": f"sin ruteo: {reason}"}]),
+        "error": error,
+        "inicios": page_starts,
+    }
+
+
+def _split_pages(full_text: str, page_starts, n_pages: int):
+    # Texto de Document AI cortado por página; sin inicios, todo va a la primera
+    if not page_starts or len(page_starts) != n_pages:
+        return [full_text] + [""] * (n_pages - 1)
+    ends = list(page_starts[1:]) + [len(full_text)]
+    return [full_text[a:b].strip("\n") for a, b in zip(page_starts, ends)]
+
+
+def extract_pdf_routed(file_bytes: bytes, rate_limiter=None, client=None):
+    """
+    Extrae un PDF ruteando página por página (ver plan_pages).
+    Devuelve (texto_completo, entidades, informe):
+      - texto_completo: las páginas en su orden original, cada una del
+        origen que le tocó.
+      - entidades: las de Document AI con "Página" llevada al número real
+        (1-based) del PDF original, más una fila TEXTO_COMPLETO por cada
+        página leída localmente.
+      - informe: {"origen", "paginas", "locales", "docai", "ahorro",
+        "decisiones": DataFrame, "error", "inicios"}; "inicios" son los
+        inicios de página en texto_completo (para build_dataframe).
+    Si Document AI falla, está en pausa por el circuit breaker o supera el
+    presupuesto de latencia (hedge_after_s), sus páginas se quedan con el
+    texto local que haya y el error queda en el informe (no se relanza).
+    """
+    with span("page_routing", bytes=len(file_bytes)) as sp:
+        plan = plan_pages(file_bytes)
+        if not PAGE_ROUTING:
+            for p in plan:
+                p["Destino"], p["Motivo"] = "Document AI", "ruteo desactivado"
+        remote = [p["Página"] for p in plan if p["Destino"] == "Document AI"]
+        sp["pages"], sp["docai_pages"] = len(plan), len(remote)
+
+        texts = {p["Página"]: p["texto"] for p in plan}
+        frames, error = [], None
+        if remote:
+            # Todo el PDF: se manda tal cual (y aprovecha el caché existente)
+            payload = file_bytes if len(remote) == len(plan) else subset_pdf(file_bytes, remote)
+            # Si Document AI falla, está en pausa (breaker) o tarda más que el
+            # presupuesto, esas páginas se quedan con el texto local que ya hay
+            budget = get_docai_resilience()[3]
+            result, source, err = run_hedged(
+                lambda: process_pages_with_document_ai(payload, rate_limiter=rate_limiter, client=client),
+                lambda error: None,
+                budget,
+            )
+            if source != "Document AI":
+                error = err
+                for p in plan:
+                    if p["Destino"] == "Document AI":
+                        p["Motivo"] += f" → sin Document AI, texto local ({type(err).__name__})"
+            else:
+                full_text, df_docai, page_starts = result
+                texts.update(zip(remote, _split_pages(full_text, page_starts, len(remote))))
+                frames.append(map_docai_pages(df_docai, remote))
+
+        local = [p for p in plan if p["Destino"] == "Local" or error is not None]
+        frames.append(pd.DataFrame(
+            [{"Etiqueta": "TEXTO_COMPLETO", "Valor": p["texto"], "Confianza": "", "Página": p["Página"]}
+             for p in local],
+            columns=["Etiqueta", "Valor", "Confianza", "Página"],
+        ))
+        frames = [f for f in frames if not f.empty]
+        df_ent = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        sent = 0 if error is not None else len(remote)
+        if sent == 0:
+            origin = "Local"
+        elif sent == len(plan):
+            origin = "Document AI"
+        else:
+            origin = "Mixto"
+        sp["saved_pages"] = len(plan) - sent
+        full_text, page_starts = join_pages([texts[p["Página"]] for p in plan])
+        report = {
+            "origen": origin,
+            "paginas": len(plan),
+            "locales": len(plan) - len(remote),
+            "docai": sent,
+            "ahorro": len(plan) - sent,
+            "decisiones": pd.DataFrame([{k: p[k] for k in ("Página", "Destino", "Motivo")} for p in plan]),
+            "error": error,
+            "inicios": page_starts,
+        }
+        return full_text, df_ent, report
@@ -0,0 +1,445 @@
+# parse_actas.py
+# --------------------------------------------------------
+# Parser de ACTAS del Consejo: lectura local de PDF/DOCX,
+# detección de secciones, bloques por facultad e ítems.
+# Sin Streamlit, para usarlo desde las apps y el modo batch.
+# --------------------------------------------------------
+
+import contextlib, io, os, re, tempfile, unicodedata
+from bisect import bisect_right
+import pandas as pd
+
+# pdfminer se importa en el primer uso; los DOCX se leen con zipfile + iterparse
+from metrics import span
+from resources import cached_resource
+from patterns import FieldMatcher, SectionMatcher, get_config, get_field_matcher, get_item_keywords, get_section_matcher
+
+# -------------------- Config (patrones) --------------------
+# Encabezados de sección, palabras clave de ítems y reglas de campos se
+# leen de config_patterns.yaml (ver patterns.py)
+FACULTY_HDR = re.compile(r"^(Facultad|Instituto Superior|Vicerrectorado|Escuela)\b.*", re.IGNORECASE)
+# Ítems: viñetas / numeración, o cada fila de tabla de un DOCX ("celda | celda")
+ITEM_SPLIT = re.compile(r"\n\s*(?:[\u2022•\-]|[\u25CF\u25A0\u25E6]|\d+\.)\s*|\n(?=[^\n]* \| )")
+
+# Extracción de PDF en paralelo por rangos de páginas (ver iter_pdf_pages_parallel):
+# PDF_WORKERS=0 usa todos los núcleos; con menos de PDF_PARALLEL_MIN_PAGES
+# páginas se queda en un solo proceso (levantar el pool no se amortiza)
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "40"))
+
+# -------------------- Utilidades --------------------
+def _norm(s: str) -> str:
+    if s is None:
+        return ""
+    s = s.replace("\x00", " ")
+    s = unicodedata.normalize("NFKC", s)
+    s = s.replace("\xa0", " ")
+    s = re.sub(r"[ \t]+", " ", s)
+    s = re.sub(r"\n{2,}", "\n", s)
+    return s.strip()
+
+def iter_pdf_pages(source, page_numbers=None):
+    """
+    Genera (n° de página 1-based, texto normalizado) página por página,
+    sin armar el texto completo del PDF en memoria.
+    source: bytes, la ruta del archivo o un archivo binario abierto.
+    page_numbers: índices 0-based a extraer (None = todas).
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            yield from iter_pdf_pages(fh, page_numbers)
+        return
+
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    out = io.StringIO()
+    rsrcmgr = PDFResourceManager(caching=True)
+    device = TextConverter(rsrcmgr, out, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    wanted = set(page_numbers) if page_numbers is not None else None
+    last = max(wanted, default=-1) if wanted is not None else None
+    try:
+        for idx, page in enumerate(PDFPage.get_pages(fp)):
+            if wanted is not None:
+                if idx > last:
+                    break
+                if idx not in wanted:
+                    continue
+            interpreter.process_page(page)
+            yield idx + 1, _norm(out.getvalue())
+            out.seek(0)
+            out.truncate()
+    finally:
+        device.close()
+
+def count_pdf_pages(source) -> int:
+    """Cantidad de páginas según el árbol de páginas (sin analizar el contenido)."""
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with open(source, "rb") if isinstance(source, str) else io.BytesIO(source) as fh:
+        doc = PDFDocument(PDFParser(fh))
+        return int(resolve1(resolve1(doc.catalog["Pages"])["Count"]))
+
+def _pdf_page_range(path: str, start: int, end: int):
+    # Corre en un proceso del pool: abre el archivo por ruta, no recibe los bytes
+    return list(iter_pdf_pages(path, range(start, end)))
+
+@cached_resource
+def _pdf_pool(workers: int):
+    # Un pool por proceso, reutilizado entre documentos; "spawn" porque la
+    # app llama desde hilos (fork con hilos vivos puede colgarse)
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def iter_pdf_pages_parallel(source, workers: int = None, min_pages: int = None):
+    """
+    Como iter_pdf_pages (mismas páginas, mismo orden) pero repartiendo
+    rangos de páginas entre procesos. source: bytes o ruta; los bytes se
+    escriben una vez a un archivo temporal y cada worker lo abre por ruta.
+    workers: None = PDF_WORKERS (0 = todos los núcleos).
+    Con menos de min_pages páginas (PDF_PARALLEL_MIN_PAGES) o un solo
+    worker se lee en el proceso actual.
+    """
+    workers = workers if workers is not None else PDF_WORKERS
+    workers = workers or os.cpu_count() or 1
+    min_pages = min_pages if min_pages is not None else PDF_PARALLEL_MIN_PAGES
+    try:
+        n_pages = count_pdf_pages(source) if workers > 1 else 0
+    except Exception:
+        n_pages = 0  # árbol de páginas raro: que lo resuelva pdfminer en serie
+    if workers <= 1 or n_pages < max(min_pages, 2):
+        yield from iter_pdf_pages(source)
+        return
+
+    with contextlib.nullcontext() if isinstance(source, str) else tempfile.TemporaryDirectory() as tmp:
+        path = source
+        if tmp is not None:
+            path = os.path.join(tmp, "doc.pdf")
+            with open(path, "wb") as fh:
+                fh.write(source)
+        # Varios rangos por worker: las páginas no cuestan todas lo mismo
+        size = max(4, -(-n_pages // (workers * 3)))
+        bounds = [(a, min(a + size, n_pages)) for a in range(0, n_pages, size)]
+        with span("pdf_parallel", pages=n_pages, workers=workers, chunks=len(bounds)):
+            pool = _pdf_pool(workers)
+            futures = [pool.submit(_pdf_page_range, path, a, b) for a, b in bounds]
+            try:
+                for fut in futures:
+                    yield from fut.result()
+            finally:
+                for fut in futures:
+                    fut.cancel()  # si se dejó de leer antes del final
+
+def read_pdf_pages(file_bytes, sections=None, workers: int = None):
+    """
+    Lee el PDF página por página y devuelve (texto, inicios_de_página):
+    inicios_de_página[i] es el offset en `texto` donde empieza la página i+1
+    (ver page_at). file_bytes: bytes o ruta del archivo. Si se pasa
+    `sections` (nombres de config_patterns.yaml), deja de leer cuando ya
+    aparecieron todas y empezó otra sección posterior (en serie); si no,
+    los PDF grandes se leen en paralelo (ver iter_pdf_pages_parallel, que
+    recibe `workers`).
+    """
+    matcher = get_section_matcher() if sections else None
+    pending = set(sections or ())
+    parts, starts, pos = [], [], 0
+    pages = iter_pdf_pages(file_bytes) if sections else iter_pdf_pages_parallel(file_bytes, workers)
+    for _, page_text in pages:
+        starts.append(pos)
+        parts.append(page_text)
+        pos += len(page_text) + 1
+        if matcher is not None:
+            done = False
+            for name, _ in matcher.find(page_text):
+                if not pending and name not in sections:
+                    done = True
+                    break
+                pending.discard(name)
+            if done:
+                break
+    return "\n".join(parts), starts
+
+def join_pages(texts):
+    """(texto, inicios_de_página) de páginas unidas con "\n", como read_pdf_pages."""
+    starts, pos = [], 0
+    for page_text in texts:
+        starts.append(pos)
+        pos += len(page_text) + 1
+    return "\n".join(texts), starts
+
+def page_at(page_starts, pos: int):
+    """N° de página (1-based) que contiene el offset `pos`, o "" si no hay páginas."""
+    if not page_starts:
+        return ""
+    return max(bisect_right(page_starts, pos), 1)
+
+def read_pdf_bytes(file_bytes: bytes) -> str:
+    return read_pdf_pages(file_bytes)[0]
+
+# Etiquetas de WordprocessingML que usa el lector de DOCX
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_T, _W_TAB, _W_BR, _W_CR = _W + "p", _W + "t", _W + "tab", _W + "br", _W + "cr"
+_W_BODY, _W_TBL, _W_TR, _W_TC = _W + "body", _W + "tbl", _W + "tr", _W + "tc"
+
+def iter_docx_blocks(source):
+    """
+    Genera los bloques de texto de un DOCX en orden de documento, leyendo
+    word/document.xml en streaming (sin armar el modelo de python-docx):
+    un string por párrafo y, en las tablas, uno por fila con las celdas
+    separadas por " | ". Tablas anidadas quedan como texto de su celda.
+    source: bytes o un archivo binario abierto.
+    """
+    import zipfile
+    from xml.etree.ElementTree import iterparse
+
+    fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    with zipfile.ZipFile(fp) as zf, zf.open("word/document.xml") as xml:
+        body = None
+        runs = []      # texto del párrafo en curso
+        rows = []      # celdas de la fila en curso, una lista por tabla abierta
+        cells = []     # párrafos de la celda en curso, una lista por celda abierta
+        for event, elem in iterparse(xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == _W_BODY:
+                    body = elem
+                elif tag == _W_TBL:
+                    rows.append([])
+                elif tag == _W_TC:
+                    cells.append([])
+                continue
+            if tag == _W_T:
+                runs.append(elem.text or "")
+            elif tag == _W_TAB:
+                runs.append("\t")
+            elif tag in (_W_BR, _W_CR):
+                runs.append("\n")
+            elif tag == _W_P:
+                text = "".join(runs)
+                runs.clear()
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == _W_TC:
+                rows[-1].append(" ".join(t.strip() for t in cells.pop() if t.strip()))
+            elif tag == _W_TR:
+                row, rows[-1] = rows[-1], []
+                if any(row):
+                    if cells:
+                        cells[-1].append(" | ".join(row))  # tabla anidada: va a su celda
+                    else:
+                        yield " | ".join(row)
+            elif tag == _W_TBL:
+                rows.pop()
+            else:
+                continue
+            # Lo ya emitido no queda colgando del árbol
+            elem.clear()
+            if body is not None and not rows and tag in (_W_P, _W_TBL):
+                body.clear()
+
+def read_docx_bytes(file_bytes: bytes) -> str:
+    # Se normaliza bloque por bloque: no hay copias del texto completo
+    return "\n".join(t for t in map(_norm, iter_docx_blocks(file_bytes)) if t)
+
+def find_acta_number(text: str) -> str:
+    m = re.search(r"ACTA\s+N[º°]?\s*([0-9]+)", text, flags=re.IGNORECASE)
+    return m.group(1).strip() if m else ""
+
+def find_date_text(text: str) -> str:
+    m = re.search(r"En la ciudad.*?\n(.*)", text, flags=re.IGNORECASE)
+    if m: return _norm(m.group(1))
+    m2 = re.search(r"a los\s+.+?d[ií]as.*?del mes de\s+.+?\s+de\s+dos mil.*", text, flags=re.IGNORECASE)
+    return _norm(m2.group(0)) if m2 else ""
+
+def split_sections(text: str, matcher: SectionMatcher = None):
+    matcher = matcher or get_section_matcher()
+    hits = matcher.find(text)
+    if not hits:
+        return [("General", 0, len(text))]
+    spans = []
+    for i, (name, start) in enumerate(hits):
+        end = hits[i+1][1] if i+1 < len(hits) else len(text)
+        spans.append((name, start, end))
+    return spans
+
+def chunk_by_faculty(section_text: str):
+    lines = [ln.strip() for ln in section_text.split("\n") if ln.strip()]
+    blocks, current, buf = [], None, []
+    for ln in lines:
+        if FACULTY_HDR.match(ln):
+            if buf:
+                blocks.append((current, "\n".join(buf)))
+                buf = []
+            current = ln
+        else:
+            buf.append(ln)
+    if buf:
+        blocks.append((current, "\n".join(buf)))
+    return blocks or [(None, section_text)]
+
+def extract_candidate_items(text: str, keywords=False):
+    # keywords: regex ya resuelto (None = sin palabras clave); por defecto el del YAML
+    if keywords is False:
+        keywords = get_item_keywords()
+    parts = ITEM_SPLIT.split("\n" + text)
+    cands = []
+    for p in parts:
+        p = p.strip(" ;\n\t")
+        if len(p) < 6: 
+            continue
+        if keywords is not None and keywords.search(p):
+            cands.append(p)
+    return cands or [text.strip()]
+
+# Rasgos de estado: se calculan una vez por bloque y se combinan (OR) con
+# los del ítem, en vez de re-escanear bloque + ítem para cada ítem
+DESTINO_RE = re.compile(r"\b(Cuadernos|revista\s+cuadernos|Cuadernos de la Secretar[ií]a de Investigaci[oó]n)\b", re.IGNORECASE)
+
+def estado_flags(text: str) -> dict:
+    t = text.lower()
+    return {
+        "baja": "baja del proyecto" in t or re.search(r"\bbaja\b", t) is not None,
+        "prorroga": "prórroga" in t or "prorroga" in t,
+        "aprob": "aprob" in t,
+        "elev": "elev" in t or "enviado" in t,
+        "solicitud": "solicitud de categorización" in t or "solicitud de categorizacion" in t,
+    }
+
+def combine_flags(a: dict, b: dict) -> dict:
+    return {k: a[k] or b[k] for k in a}
+
+def estado_from_flags(f: dict) -> str:
+    if f["baja"]:
+        return "Baja"
+    if f["prorroga"]:
+        return "Prórroga"
+    if f["aprob"] and f["elev"]:
+        return "Aprobado y elevado"
+    if f["aprob"]:
+        return "Aprobado"
+    if f["solicitud"]:
+        return "Solicitud"
+    return ""
+
+def infer_estado(text: str) -> str:
+    return estado_from_flags(estado_flags(text))
+
+def infer_destino_publicacion(text: str) -> str:
+    if DESTINO_RE.search(text):
+        return "Revista Cuadernos"
+    return ""
+
+def extract_fields(text: str, matcher: FieldMatcher = None):
+    """
+    Campos del ítem según las reglas `fields` de config_patterns.yaml,
+    en una sola pasada: ({campo: valor}, {campo: regla que lo dio}).
+    """
+    return (matcher or get_field_matcher()).extract(text)
+
+def extract_title_director(text: str):
+    values, _ = extract_fields(text)
+    return values.get("titulo"), values.get("director")
+
+def build_dataframe(text: str, source_name: str, page_starts=None, audit: bool = False) -> pd.DataFrame:
+    """
+    page_starts: inicios de página devueltos por read_pdf_pages; si se
+    pasan, cada fila lleva la página donde aparece el ítem.
+    audit: agrega la columna "Reglas" (qué regla del YAML dio cada campo).
+    """
+    with span("build_dataframe", chars=len(text), pages=len(page_starts or ())) as sp:
+        df, fired = _build_dataframe(text, source_name, page_starts, audit)
+        sp["rows"] = len(df)
+        sp["rules"] = fired
+        return df
+
+# Columnas fijas; los campos extra del YAML (Codirector, Equipo...) van
+# después de Director, ver output_columns
+COLUMNS = [
+    "Acta", "Fecha", "Facultad", "Tipo_tema", "Titulo_o_denominacion",
+    "Director", "Estado", "Destino_publicacion", "Fuente_archivo", "Página",
+]
+CORE_FIELDS = {"titulo": "Titulo_o_denominacion", "director": "Director"}
+
+def _extra_fields(matcher: FieldMatcher = None):
+    return [(f, c) for f, c in (matcher or get_field_matcher()).columns.items() if f not in CORE_FIELDS]
+
+def output_columns(matcher: FieldMatcher = None):
+    """Columnas de build_dataframe con la config actual."""
+    cols = list(COLUMNS)
+    at = cols.index("Director") + 1
+    cols[at:at] = [c for _, c in _extra_fields(matcher)]
+    return cols
+
+def _build_dataframe(text: str, source_name: str, page_starts, audit: bool = False):
+    acta = find_acta_number(text)
+    fecha = find_date_text(text)
+    # La config se resuelve una vez por documento (no un os.stat por ítem)
+    # y queda fija aunque el YAML cambie a mitad del parseo
+    cfg = get_config()
+    fields, keywords = cfg.fields, cfg.item_keywords
+    sections = split_sections(text, cfg.sections)
+    extra = _extra_fields(fields)
+    fired_count = {}
+    # Columnas como listas (ya sin espacios): una sola construcción del DataFrame
+    facultad, tipo, titulo, director_col, estado_col, destino_col, pagina, reglas = ([] for _ in range(8))
+    extra_cols = {c: [] for _, c in extra}
+    for sec_name, s, e in sections:
+        chunk = text[s:e].strip()
+        pos = s  # cursor para ubicar cada ítem en el texto (en orden)
+        for faculty, block in chunk_by_faculty(chunk):
+            # Rasgos del bloque una sola vez; por ítem solo se mira el ítem
+            block_flags = estado_flags(block)
+            block_destino = DESTINO_RE.search(block) is not None
+            faculty = (faculty or "").strip()
+            for item in extract_candidate_items(block, keywords):
+                if page_starts:
+                    found = text.find(item.split("\n", 1)[0][:60], pos, e)
+                    if found >= 0:
+                        pos = found
+                values, fired = extract_fields(item, fields)
+                for f, rule in fired.items():
+                    key = f"{f}:{rule}"
+                    fired_count[key] = fired_count.get(key, 0) + 1
+                flags = combine_flags(block_flags, estado_flags(item))
+                facultad.append(faculty)
+                tipo.append(sec_name.strip())
+                titulo.append((values.get("titulo") or item)[:400].strip())
+                director_col.append(values.get("director", ""))
+                for f, c in extra:
+                    extra_cols[c].append(values.get(f, ""))
+                estado_col.append(estado_from_flags(flags))
+                destino_col.append("Revista Cuadernos" if block_destino or DESTINO_RE.search(item) else "")
+                pagina.append(str(page_at(page_starts, pos)))
+                if audit:
+                    reglas.append("; ".join(f"{f}={r}" for f, r in fired.items()))
+    if not titulo:
+        return pd.DataFrame(), fired_count
+    n = len(titulo)
+    data = {
+        "Acta": [acta.strip()] * n,
+        "Fecha": [fecha.strip()] * n,
+        "Facultad": facultad,
+        "Tipo_tema": tipo,
+        "Titulo_o_denominacion": titulo,
+        "Director": director_col,
+        **extra_cols,
+        "Estado": estado_col,
+        "Destino_publicacion": destino_col,
+        "Fuente_archivo": [str(source_name).strip()] * n,
+        "Página": pagina,
+    }
+    columns = output_columns(fields)
+    if audit:
+        data["Reglas"] = reglas
+        columns.append("Reglas")
+    return pd.DataFrame(data, columns=columns), fired_count
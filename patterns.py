@@ -0,0 +1,213 @@
+# patterns.py
+# --------------------------------------------------------
+# Carga config_patterns.yaml una sola vez y compila los
+# patrones de encabezados de sección, las palabras clave de
+# ítems y las reglas de campos, cada uno en un único regex.
+# Se recarga solo si cambia el mtime del archivo.
+# --------------------------------------------------------
+
+import hashlib
+import os
+import re
+import threading
+
+import yaml
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse
+
+
+CONFIG_PATH = os.environ.get(
+    "CONFIG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config_patterns.yaml"),
+)
+
+
+class SectionMatcher:
+    """
+    Todas las secciones en un solo regex: un grupo con nombre por
+    sección (s0, s1, ...), así m.lastgroup indica directamente la
+    sección de cada coincidencia sin recorrer los grupos.
+    """
+
+    def __init__(self, sections):
+        named = []
+        self.names = {}
+        for i, sec in enumerate(sections):
+            pats = [p for p in sec.get("patterns") or [] if p]
+            if not pats:
+                continue
+            group = f"s{i}"
+            self.names[group] = sec["name"]
+            named.append(f"(?P<{group}>\\b(?:{'|'.join(pats)})\\b)")
+        self.regex = re.compile("|".join(named), flags=re.IGNORECASE) if named else None
+
+    def find(self, text: str):
+        """[(nombre_sección, inicio)] en orden de aparición, en una pasada."""
+        if self.regex is None:
+            return []
+        names = self.names
+        return [(names[m.lastgroup], m.start()) for m in self.regex.finditer(text)]
+
+
+def _first_chars(pattern: str, flags: int):
+    """
+    Caracteres con los que puede empezar una coincidencia de `pattern`,
+    o None si no se pueden acotar (p.ej. empieza con algo opcional).
+    """
+    c = _sre_parse
+
+    def first(items):
+        for op, av in items:
+            if op is c.AT:            # \b, ^: no consume, se mira lo que sigue
+                continue
+            if op is c.LITERAL:
+                return {chr(av)}
+            if op is c.IN:
+                out = set()
+                for sub_op, sub_av in av:
+                    if sub_op is c.LITERAL:
+                        out.add(chr(sub_av))
+                    elif sub_op is c.RANGE and sub_av[1] - sub_av[0] < 128:
+                        out.update(chr(x) for x in range(sub_av[0], sub_av[1] + 1))
+                    else:
+                        return None
+                return out
+            if op is c.SUBPATTERN:
+                return first(av[-1])
+            if op is c.BRANCH:
+                out = set()
+                for branch in av[1]:
+                    sub = first(branch)
+                    if sub is None:
+                        return None
+                    out |= sub
+                return out
+            if op in (c.MAX_REPEAT, c.MIN_REPEAT) and av[0] >= 1:
+                return first(av[2])
+            return None
+        return None
+
+    try:
+        chars = first(c.parse(pattern, flags))
+    except Exception:
+        return None
+    if chars and flags & re.IGNORECASE:
+        chars |= {x.upper() for x in chars} | {x.lower() for x in chars}
+    return chars
+
+
+class FieldMatcher:
+    """
+    Todas las reglas de todos los campos en un solo regex: un grupo
+    r0, r1, ... por regla (m.lastgroup dice qué regla coincidió) y su
+    valor en r{i}_v. extract() recorre el ítem una sola vez.
+    """
+
+    FLAGS = re.IGNORECASE | re.MULTILINE
+
+    def __init__(self, fields):
+        named = []
+        self.rules = {}    # grupo → (campo, prioridad, nombre de la regla, grupo del valor)
+        self.columns = {}  # campo → columna del DataFrame
+        for field in fields:
+            self.columns[field["name"]] = field.get("column") or field["name"]
+            for prio, rule in enumerate(field.get("rules") or []):
+                group = f"r{len(self.rules)}"
+                pat = rule["pattern"]
+                value = f"{group}_v" if "(?P<v>" in pat else group
+                pat = pat.replace("(?P<v>", f"(?P<{group}_v>").replace("(?P=v)", f"(?P={group}_v)")
+                self.rules[group] = (field["name"], prio, rule.get("name") or group, value)
+                named.append(f"(?P<{group}>{pat})")
+        self.regex = None
+        if named:
+            pattern = "|".join(named)
+            # Si todas las reglas empiezan con caracteres conocidos, un lookahead
+            # con esos caracteres descarta rápido las posiciones que no sirven
+            chars = _first_chars(pattern, self.FLAGS)
+            if chars:
+                pattern = f"(?=[{''.join(re.escape(ch) for ch in sorted(chars))}])(?:{pattern})"
+            self.regex = re.compile(pattern, flags=self.FLAGS)
+
+    def extract(self, text: str):
+        """
+        ({campo: valor}, {campo: regla}) con los campos encontrados.
+        Si un campo aparece con varias reglas gana la de mayor prioridad
+        (la primera de su lista en el YAML); con la misma, la primera en el texto.
+        """
+        values, fired, best = {}, {}, {}
+        if self.regex is None:
+            return values, fired
+        rules = self.rules
+        for m in self.regex.finditer(text):
+            field, prio, name, value_group = rules[m.lastgroup]
+            if field in best and best[field] <= prio:
+                continue
+            value = (m.group(value_group) or "").strip(" .;")
+            if not value:
+                continue
+            best[field] = prio
+            values[field] = value
+            fired[field] = name
+        return values, fired
+
+
+class _Config:
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.data = {}
+        self.fingerprint = ""
+        self.sections = SectionMatcher([])
+        self.fields = FieldMatcher([])
+        self.item_keywords = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return self
+        with self._lock:
+            if mtime != self.mtime:
+                with open(self.path, "rb") as fh:
+                    raw = fh.read()
+                self.data = yaml.safe_load(raw) or {}
+                self.fingerprint = hashlib.sha256(raw).hexdigest()
+                self.sections = SectionMatcher(self.data.get("sections") or [])
+                self.fields = FieldMatcher(self.data.get("fields") or [])
+                keywords = [k for k in (self.data.get("items") or {}).get("keywords") or [] if k]
+                self.item_keywords = re.compile("|".join(f"(?:{k})" for k in keywords),
+                                                flags=re.IGNORECASE) if keywords else None
+                self.mtime = mtime
+        return self
+
+
+_configs = {}
+
+
+def get_config(path: str = None) -> _Config:
+    path = path or CONFIG_PATH
+    cfg = _configs.get(path)
+    if cfg is None:
+        cfg = _configs.setdefault(path, _Config(path))
+    return cfg.refresh()
+
+
+def get_section_matcher(path: str = None) -> SectionMatcher:
+    return get_config(path).sections
+
+
+def get_field_matcher(path: str = None) -> FieldMatcher:
+    return get_config(path).fields
+
+
+def get_item_keywords(path: str = None):
+    """Regex de palabras clave de ítems (None si el YAML no define ninguna)."""
+    return get_config(path).item_keywords
+
+
+def config_fingerprint(path: str = None) -> str:
+    """Hash del YAML: cambia cuando hay que volver a parsear las actas."""
+    return get_config(path).fingerprint
@@ -0,0 +1,274 @@
+# project_linking.py
+# --------------------------------------------------------
+# Vinculación de proyectos entre actas: el mismo proyecto
+# aparece como presentación, informe de avance, informe
+# final, prórroga o baja con redacciones distintas.
+# Firmas MinHash de los títulos + índice LSH por bandas:
+# cada fila nueva solo se compara con sus candidatos, así
+# que agregar actas no obliga a reconstruir nada.
+# --------------------------------------------------------
+
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from metrics import span
+
+
+PROJECTS_INDEX = os.environ.get("PROJECTS_INDEX", os.path.join(".cache", "proyectos.npz"))
+
+_PRIME = np.uint64(4294967291)  # primo < 2**32: a*x + b entra en uint64 sin desbordar
+_HONORIFICS = {"dr", "dra", "mg", "lic", "esp", "prof", "ing", "arq"}
+
+
+def normalize_title(text: str) -> str:
+    """Minúsculas ASCII, sin acentos (ñ → n) ni puntuación, espacios simples."""
+    text = unicodedata.normalize("NFKD", str(text or "").lower()).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^0-9a-z]+", " ", text).strip()
+
+
+def shingles(text: str) -> np.ndarray:
+    """
+    4-gramas de caracteres del título normalizado, cada uno como el
+    entero de sus 4 bytes ASCII (sin colisiones y sin hashear en Python).
+    """
+    raw = normalize_title(text).encode("ascii")
+    if not raw:
+        return np.zeros(0, dtype=np.uint64)
+    if len(raw) < 4:
+        raw = raw.ljust(4)
+    b = np.frombuffer(raw, dtype=np.uint8).astype(np.uint64)
+    grams = (b[:-3] << np.uint64(24)) | (b[1:-2] << np.uint64(16)) | (b[2:-1] << np.uint64(8)) | b[3:]
+    return np.unique(grams)
+
+
+def _surnames(director: str):
+    words = normalize_title(director).split()
+    return {w for w in words if w not in _HONORIFICS and len(w) > 2}
+
+
+class ProjectIndex:
+    """
+    Índice incremental de proyectos.
+    num_perm permutaciones MinHash en `bands` bandas de num_perm/bands filas;
+    dos títulos que coinciden en una banda son candidatos y se confirman
+    si la similitud estimada (Jaccard de 4-gramas) llega a `threshold` y,
+    cuando ambos tienen director, comparten algún apellido.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.6, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.num_perm, self.bands, self.threshold, self.seed = num_perm, bands, threshold, seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._rows = num_perm // bands
+        self._sigs = np.zeros((1024, num_perm), dtype=np.uint32)  # crece duplicando
+        self.member_project = []  # fila del índice → n° de proyecto
+        self.member_keys = []
+        self._key_pos = {}
+        self.project_directors = []
+        self._buckets = {}
+
+    # ---------- MinHash / LSH ----------
+    def signature(self, title: str) -> np.ndarray:
+        x = shingles(title)
+        if not len(x):
+            return None
+        x %= _PRIME
+        return ((np.outer(x, self._a) + self._b) % _PRIME).min(axis=0).astype(np.uint32)
+
+    def signatures(self, titles, chunk: int = 2000):
+        """
+        Firmas de muchos títulos a la vez (None para los vacíos): los
+        4-gramas de un tramo se hashean juntos y se reduce por título.
+        """
+        out = []
+        for start in range(0, len(titles), chunk):
+            grams = [shingles(t) for t in titles[start:start + chunk]]
+            sizes = np.array([len(g) for g in grams])
+            if not sizes.sum():
+                out.extend([None] * len(grams))
+                continue
+            x = np.concatenate(grams) % _PRIME
+            hashed = (np.outer(x, self._a) + self._b) % _PRIME
+            offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+            nonempty = sizes > 0
+            mins = np.minimum.reduceat(hashed, offsets[nonempty], axis=0).astype(np.uint32)
+            it = iter(mins)
+            out.extend(next(it) if ok else None for ok in nonempty)
+        return out
+
+    def _band_keys(self, sig: np.ndarray):
+        r = self._rows
+        return [(b, sig[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def _append_signature(self, row: int, sig: np.ndarray):
+        if row >= len(self._sigs):
+            grown = np.zeros((len(self._sigs) * 2, self.num_perm), dtype=np.uint32)
+            grown[:row] = self._sigs[:row]
+            self._sigs = grown
+        self._sigs[row] = sig
+
+    @staticmethod
+    def project_id(n: int) -> str:
+        return f"PRJ-{n + 1:05d}"
+
+    # ---------- Alta incremental ----------
+    def add(self, title: str, director: str = "", key: str = None, sig: np.ndarray = None):
+        """
+        Ubica la fila en un proyecto existente o crea uno nuevo y devuelve
+        su ID (None si el título está vacío). Una misma `key` vuelve a dar
+        el mismo ID sin agregar nada. `sig` evita recalcular la firma si ya
+        se calculó en bloque con signatures().
+        """
+        if key is not None and key in self._key_pos:
+            return self.project_id(self.member_project[self._key_pos[key]])
+        if sig is None:
+            sig = self.signature(title)
+        if sig is None:
+            return None
+
+        bands = self._band_keys(sig)
+        # Cada bucket guarda una fila por proyecto: los candidatos crecen con
+        # los proyectos parecidos, no con las veces que apareció cada uno
+        candidates = {row for band in bands for row in self._buckets.get(band, {}).values()}
+        best = None
+        surnames = _surnames(director)
+        if candidates:
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            sims = np.count_nonzero(self._sigs[rows] == sig, axis=1) / self.num_perm
+            for i in np.argsort(-sims, kind="stable"):
+                if sims[i] < self.threshold:
+                    break
+                proj = self.member_project[rows[i]]
+                other = self.project_directors[proj]
+                if surnames and other and not (surnames & other):
+                    continue
+                best = proj
+                break
+
+        if best is None:
+            best = len(self.project_directors)
+            self.project_directors.append(surnames)
+        elif surnames and not self.project_directors[best]:
+            self.project_directors[best] = surnames
+
+        row = len(self.member_project)
+        self._append_signature(row, sig)
+        self.member_project.append(best)
+        self.member_keys.append(key or "")
+        if key is not None:
+            self._key_pos[key] = row
+        for band in bands:
+            self._buckets.setdefault(band, {}).setdefault(best, row)
+        return self.project_id(best)
+
+    def __len__(self):
+        return len(self.project_directors)
+
+    # ---------- Persistencia ----------
+    def save(self, path: str = PROJECTS_INDEX):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        meta = {"num_perm": self.num_perm, "bands": self.bands, "threshold": self.threshold, "seed": self.seed}
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            meta=np.array(json.dumps(meta)),
+            signatures=self._sigs[:len(self.member_project)],
+            member_project=np.array(self.member_project, dtype=np.int32),
+            member_keys=np.array(self.member_keys, dtype=str),
+            project_directors=np.array(["|".join(sorted(d)) for d in self.project_directors], dtype=str),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = PROJECTS_INDEX, **params):
+        """Índice guardado en `path`, o uno vacío si no existe."""
+        if not os.path.exists(path):
+            return cls(**params)
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            idx = cls(**meta)
+            sigs = data["signatures"].astype(np.uint32)
+            idx._sigs = np.zeros((max(1024, 2 * len(sigs)), idx.num_perm), dtype=np.uint32)
+            idx._sigs[:len(sigs)] = sigs
+            idx.member_project = data["member_project"].tolist()
+            idx.member_keys = data["member_keys"].tolist()
+            idx.project_directors = [set(d.split("|")) - {""} for d in data["project_directors"].tolist()]
+        idx._key_pos = {k: i for i, k in enumerate(idx.member_keys) if k}
+        # Los buckets se reconstruyen de las firmas (no se guardan)
+        for row, sig in enumerate(sigs):
+            proj = idx.member_project[row]
+            for band in idx._band_keys(sig):
+                idx._buckets.setdefault(band, {}).setdefault(proj, row)
+        return idx
+
+
+# ============= DataFrames del parser =============
+def row_key(row) -> str:
+    raw = "|".join(str(row.get(c, "")) for c in ("Fuente_archivo", "Acta", "Titulo_o_denominacion", "Director"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def assign_projects(df: pd.DataFrame, index: ProjectIndex) -> pd.Series:
+    """Proyecto_ID de cada fila (las filas nuevas se agregan al índice)."""
+    with span("project_linking", rows=len(df)) as sp:
+        before = len(index)
+        records = df.to_dict("records")
+        keys = [row_key(r) for r in records]
+        # Firmas en bloque solo para las filas que el índice no conoce
+        new = [i for i, k in enumerate(keys) if k not in index._key_pos]
+        sigs = dict(zip(new, index.signatures([str(records[i]["Titulo_o_denominacion"]) for i in new])))
+        ids = []
+        for i, (r, k) in enumerate(zip(records, keys)):
+            sig = sigs.get(i)
+            if i in sigs and sig is None:
+                ids.append("")  # título vacío
+                continue
+            ids.append(index.add(r["Titulo_o_denominacion"], r.get("Director", ""), key=k, sig=sig) or "")
+        sp["projects_new"] = len(index) - before
+    return pd.Series(ids, index=df.index, name="Proyecto_ID")
+
+
+def link_projects(df: pd.DataFrame, path: str = PROJECTS_INDEX) -> pd.DataFrame:
+    """Agrega la columna Proyecto_ID usando (y actualizando) el índice en `path`."""
+    index = ProjectIndex.load(path)
+    out = df.copy()
+    out["Proyecto_ID"] = assign_projects(out, index) if not out.empty else []
+    index.save(path)
+    return out
+
+
+def timeline(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Historia de cada proyecto: una fila por aparición, ordenadas por
+    proyecto y n° de acta (Proyecto_ID, Acta, Fecha, Tipo_tema, Estado, ...).
+    """
+    cols = ["Proyecto_ID", "Acta", "Fecha", "Tipo_tema", "Estado", "Titulo_o_denominacion",
+            "Director", "Fuente_archivo", "Página"]
+    out = df[df["Proyecto_ID"].astype(str) != ""]
+    out = out[[c for c in cols if c in out.columns]].copy()
+    out["_acta"] = pd.to_numeric(out["Acta"], errors="coerce")
+    out = out.sort_values(["Proyecto_ID", "_acta"], kind="stable").drop(columns="_acta")
+    out.insert(1, "Aparicion", out.groupby("Proyecto_ID").cumcount() + 1)
+    return out.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # python project_linking.py actas_extraccion.csv [timeline.csv]
+    src = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("OUTPUT_CSV", "actas_extraccion.csv")
+    dst = sys.argv[2] if len(sys.argv) > 2 else "proyectos_timeline.csv"
+    data = pd.read_csv(src, dtype=str).fillna("")
+    if "Proyecto_ID" not in data.columns:
+        data = link_projects(data)
+    tl = timeline(data)
+    tl.to_csv(dst, index=False, encoding="utf-8")
+    print(f"{tl['Proyecto_ID'].nunique()} proyectos, {len(tl)} apariciones → {dst}")
@@ -0,0 +1,81 @@
+# resources.py
+# --------------------------------------------------------
+# Registro de recursos por proceso (credenciales, clientes
+# de Google, servicios): se crean en el primer uso y se
+# comparten entre reruns/sesiones de Streamlit y el modo
+# batch, como st.cache_resource pero sin depender de él.
+# --------------------------------------------------------
+
+import functools
+import os
+import threading
+
+
+_lock = threading.Lock()
+_resources = {}
+_key_locks = {}
+
+
+def cached_resource(func):
+    """
+    Memoiza func(*args) a nivel proceso. La primera llamada con unos
+    argumentos dados crea el recurso (una sola vez aunque haya varios
+    hilos); las siguientes devuelven el mismo objeto.
+    """
+    @functools.wraps(func)
+    def wrapper(*args):
+        key = (func.__module__, func.__qualname__, args)
+        try:
+            return _resources[key]
+        except KeyError:
+            pass
+        with _lock:
+            key_lock = _key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in _resources:
+                _resources[key] = func(*args)
+            return _resources[key]
+
+    wrapper.clear = lambda: clear_resources(func)
+    return wrapper
+
+
+def clear_resources(func=None):
+    """Descarta los recursos de func (o todos), p.ej. al rotar credenciales."""
+    with _lock:
+        for key in list(_resources):
+            if func is None or key[:2] == (func.__module__, func.__qualname__):
+                del _resources[key]
+
+
+def get_gcp_credentials(scopes=None):
+    """
+    Credenciales de la cuenta de servicio, desde Streamlit Secrets:
+      [gcp_service_account]
+      ...
+    Fuera de Streamlit (modo batch / GitHub Actions) usa el archivo
+    indicado en GOOGLE_APPLICATION_CREDENTIALS.
+    Se construyen una vez por proceso y por conjunto de scopes.
+    """
+    return _load_gcp_credentials(tuple(scopes or ()))
+
+
+@cached_resource
+def _load_gcp_credentials(scopes: tuple):
+    # google-auth / streamlit recién en el primer uso
+    from google.oauth2 import service_account
+
+    try:
+        import streamlit as st
+        info = st.secrets["gcp_service_account"]
+    except Exception:
+        info = None
+    if info is not None:
+        creds = service_account.Credentials.from_service_account_info(info)
+    else:
+        creds = service_account.Credentials.from_service_account_file(
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"]
+        )
+    if scopes:
+        creds = creds.with_scopes(scopes)
+    return creds
@@ -0,0 +1,321 @@
+# sheets_queue.py
+# --------------------------------------------------------
+# Cola persistente (SQLite) para subir a Google Sheets sin
+# bloquear la app: la UI encola y un hilo de fondo (uno por
+# proceso) junta los lotes pendientes de la misma hoja en
+# una sola escritura (upsert), reintenta con backoff ante
+# cuota (429) o errores 5xx y retoma lo pendiente al
+# reiniciar.
+# --------------------------------------------------------
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+import metrics
+from resources import cached_resource
+from upload_to_sheets import SOURCE_COLUMNS, resolve_target, upload_values
+
+
+QUEUE_DB = os.environ.get("SHEETS_QUEUE_DB", os.path.join(".cache", "sheets_queue.db"))
+# Espera tras un encolado para juntar lotes que llegan casi juntos (s)
+COALESCE_DELAY = float(os.environ.get("SHEETS_QUEUE_DELAY", "2"))
+MAX_ATTEMPTS = int(os.environ.get("SHEETS_QUEUE_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE = 5.0     # s; se duplica en cada intento
+BACKOFF_MAX = 600.0
+# Un lote "subiendo" de otro equipo (o sin dueño) se retoma si no se tocó
+# en este tiempo (s); en el mismo equipo, en cuanto su proceso ya no existe
+STALE_AFTER = float(os.environ.get("SHEETS_QUEUE_STALE_AFTER", "1800"))
+
+# Identifica a este proceso como dueño de los lotes que toma (el pid solo
+# no alcanza: tras un reinicio del contenedor suele repetirse)
+_TOKEN = uuid.uuid4().hex[:12]
+
+# Estados de un lote
+PENDING, RUNNING, DONE, FAILED = "pendiente", "subiendo", "ok", "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lotes (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    spreadsheet_id  TEXT NOT NULL,
+    sheet_name      TEXT NOT NULL,
+    columnas        TEXT NOT NULL,
+    filas           TEXT NOT NULL,
+    n_filas         INTEGER NOT NULL,
+    delete_missing  INTEGER NOT NULL DEFAULT 0,
+    estado          TEXT NOT NULL,
+    intentos        INTEGER NOT NULL DEFAULT 0,
+    proximo         REAL NOT NULL,
+    creado          REAL NOT NULL,
+    actualizado     REAL NOT NULL,
+    escritura       INTEGER,
+    error           TEXT,
+    dueno           TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_lotes_estado ON lotes(estado, proximo);
+"""
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    path = path or QUEUE_DB
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    if "dueno" not in {r["name"] for r in conn.execute("PRAGMA table_info(lotes)")}:
+        _add_owner_column(conn)
+    return conn
+
+
+def _add_owner_column(conn: sqlite3.Connection):
+    # Cola anterior a lotes.dueno: sus lotes "subiendo" quedan sin dueño y
+    # se retoman por tiempo (ver _is_stale)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if "dueno" not in {r["name"] for r in conn.execute("PRAGMA table_info(lotes)")}:
+            conn.execute("ALTER TABLE lotes ADD COLUMN dueno TEXT")
+
+
+@contextmanager
+def _transaction(path: str = None):
+    # Una transacción y la conexión se cierra al salir
+    conn = connect(path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def enqueue(df: pd.DataFrame, spreadsheet_id: str = None, sheet_name: str = None,
+            delete_missing: bool = False, path: str = None) -> int:
+    """
+    Encola df para subirlo a la hoja (IDs por defecto de [sheets]) y
+    despierta al hilo de subida. Devuelve el id del lote (ver status).
+    """
+    spreadsheet_id, sheet_name = resolve_target(spreadsheet_id, sheet_name)
+    if not spreadsheet_id or not sheet_name:
+        raise ValueError("Falta spreadsheet_id o sheet_name ([sheets] en secrets)")
+    columns = [str(c) for c in df.columns]
+    values = df.astype(str).values.tolist()
+    now = time.time()
+    with _transaction(path) as conn:
+        cur = conn.execute(
+            "INSERT INTO lotes (spreadsheet_id, sheet_name, columnas, filas, n_filas, delete_missing,"
+            " estado, proximo, creado, actualizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (spreadsheet_id, sheet_name, json.dumps(columns, ensure_ascii=False),
+             json.dumps(values, ensure_ascii=False), len(values), int(delete_missing),
+             PENDING, now, now, now),
+        )
+        batch_id = cur.lastrowid
+    get_uploader(path).wake()
+    return batch_id
+
+
+def status(batch_ids=None, path: str = None) -> pd.DataFrame:
+    """Estado de los lotes pedidos (o de los últimos 50), sin las filas."""
+    query = ("SELECT id, spreadsheet_id, sheet_name, n_filas, estado, intentos, proximo,"
+             " creado, actualizado, escritura, error FROM lotes")
+    with _transaction(path) as conn:
+        if batch_ids is not None:
+            ids = list(batch_ids)
+            rows = conn.execute(f"{query} WHERE id IN ({','.join('?' * len(ids))}) ORDER BY id",
+                                ids).fetchall() if ids else []
+        else:
+            rows = conn.execute(f"{query} ORDER BY id DESC LIMIT 50").fetchall()
+    return pd.DataFrame([dict(r) for r in rows])
+
+
+def coalesce(batches):
+    """
+    Junta lotes de la misma hoja (en orden de llegada) en una escritura:
+    (columnas, filas, delete_missing). Un lote con delete_missing es la
+    base completa, así que descarta los anteriores; si no, por cada
+    archivo (Fuente_archivo / Archivo) quedan las filas del último lote
+    que lo trae.
+    """
+    start = max((i for i, b in enumerate(batches) if b["delete_missing"]), default=0)
+    batches = batches[start:]
+    columns = batches[-1]["columnas"]
+    src = next((c for c in SOURCE_COLUMNS if c in columns), None)
+    by_source, order = {}, []
+    for b in batches:
+        idx = [b["columnas"].index(c) if c in b["columnas"] else None for c in columns]
+        rows = [[r[i] if i is not None else "" for i in idx] for r in b["filas"]]
+        if src is None:
+            by_source.setdefault(None, []).extend(rows)
+            order = [None]
+            continue
+        pos = columns.index(src)
+        fresh = {}
+        for r in rows:
+            fresh.setdefault(r[pos], []).append(r)
+        for source, source_rows in fresh.items():
+            if source not in by_source:
+                order.append(source)
+            by_source[source] = source_rows
+    values = [r for source in order for r in by_source[source]]
+    return columns, values, bool(batches[0]["delete_missing"])
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{_TOKEN}"
+
+
+def _is_stale(owner: str, updated: float, now: float) -> bool:
+    """¿El proceso que tomó el lote ya no lo está subiendo? (ver STALE_AFTER)"""
+    try:
+        host, pid, token = owner.rsplit(":", 2)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return now - updated > STALE_AFTER  # sin dueño (cola anterior)
+    if host != socket.gethostname() or os.name == "nt":
+        return now - updated > STALE_AFTER
+    if pid == os.getpid():
+        return token != _TOKEN  # mismo pid que un proceso anterior
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # existe, de otro usuario
+    return False
+
+
+def _is_retryable(e: Exception) -> bool:
+    status_code = getattr(getattr(e, "resp", None), "status", None)
+    if status_code is not None:
+        return int(status_code) == 429 or int(status_code) >= 500
+    # Sin respuesta HTTP: red caída, timeout, etc.
+    return isinstance(e, (OSError, TimeoutError))
+
+
+class SheetsUploader:
+    """
+    Hilo de fondo que vacía la cola. Toma todos los lotes pendientes y
+    vencidos, los agrupa por hoja, sube cada grupo con una sola llamada a
+    upload_values y marca los lotes como ok / pendiente (con el próximo
+    intento) / error. Los lotes "subiendo" cuyo dueño murió a mitad vuelven
+    a pendiente (ver _is_stale; el upsert es idempotente), pero nunca los
+    que otro hilo o proceso vivo tiene en curso.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._wake = threading.Event()
+        self._wake.set()  # al arrancar se revisa lo que haya quedado pendiente
+        self._thread = threading.Thread(target=self._run, name="sheets-uploader", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        # El primer ciclo también espera COALESCE_DELAY (ver __init__)
+        wait = None
+        while True:
+            if self._wake.wait(timeout=wait):
+                self._wake.clear()
+                time.sleep(COALESCE_DELAY)
+            try:
+                wait = self._drain()
+            except Exception:
+                wait = BACKOFF_BASE  # p.ej. base bloqueada: se vuelve a probar
+
+    def _claim(self):
+        """
+        Pasa a "subiendo" a nombre de este proceso (en una transacción: puede
+        haber otro proceso) los lotes pendientes de cada hoja, con los que
+        quedaron huérfanos, siempre que ninguno de esa hoja esté
+        esperando un reintento: así un lote viejo nunca se escribe después
+        de uno más nuevo, y al reintentar van todos juntos.
+        Devuelve ({(spreadsheet_id, hoja): [lotes]}, próximo reintento o None).
+        """
+        now = time.time()
+        with _transaction(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            orphans = [r["id"] for r in conn.execute(
+                "SELECT id, dueno, actualizado FROM lotes WHERE estado = ?", (RUNNING,))
+                if _is_stale(r["dueno"], r["actualizado"], now)]
+            conn.executemany("UPDATE lotes SET estado = ? WHERE id = ?", [(PENDING, i) for i in orphans])
+            rows = conn.execute("SELECT * FROM lotes WHERE estado = ? ORDER BY id", (PENDING,)).fetchall()
+            pending = {}
+            for r in rows:
+                pending.setdefault((r["spreadsheet_id"], r["sheet_name"]), []).append(r)
+            due = {k: v for k, v in pending.items() if max(r["proximo"] for r in v) <= now}
+            owner = _owner()
+            conn.executemany("UPDATE lotes SET estado = ?, actualizado = ?, dueno = ? WHERE id = ?",
+                             [(RUNNING, now, owner, r["id"]) for v in due.values() for r in v])
+        waiting = [max(r["proximo"] for r in v) for k, v in pending.items() if k not in due]
+        groups = {}
+        for key, batch_rows in due.items():
+            for r in batch_rows:
+                b = dict(r)
+                b["columnas"], b["filas"] = json.loads(b["columnas"]), json.loads(b["filas"])
+                groups.setdefault(key, []).append(b)
+        return groups, min(waiting, default=None)
+
+    def _drain(self):
+        """Sube lo vencido; devuelve cuántos segundos dormir hasta el próximo reintento."""
+        groups, next_due = self._claim()
+        for (spreadsheet_id, sheet_name), batches in groups.items():
+            self._upload(spreadsheet_id, sheet_name, batches)
+        if groups:
+            return 0.0  # puede haber llegado algo mientras tanto
+        return max(next_due - time.time(), 0.5) if next_due else None
+
+    def _upload(self, spreadsheet_id, sheet_name, batches):
+        columns, values, delete_missing = coalesce(batches)
+        ids = [b["id"] for b in batches]
+        try:
+            with metrics.span("sheets_queue", batches=len(ids), rows=len(values)):
+                upload_values(columns, values, spreadsheet_id, sheet_name, delete_missing=delete_missing)
+        except Exception as e:
+            self._failed(batches, e)
+        else:
+            with _transaction(self.path) as conn:
+                conn.executemany(
+                    "UPDATE lotes SET estado = ?, actualizado = ?, escritura = ?, error = NULL WHERE id = ?",
+                    [(DONE, time.time(), ids[-1], i) for i in ids],
+                )
+
+    def _failed(self, batches, e):
+        now = time.time()
+        updates = []
+        for b in batches:
+            attempts = b["intentos"] + 1
+            if _is_retryable(e) and attempts < MAX_ATTEMPTS:
+                delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+                state, due = PENDING, now + delay * random.uniform(0.8, 1.2)
+            else:
+                state, due = FAILED, now
+            updates.append((state, attempts, due, now, f"{type(e).__name__}: {e}"[:300], b["id"]))
+        with _transaction(self.path) as conn:
+            conn.executemany(
+                "UPDATE lotes SET estado = ?, intentos = ?, proximo = ?, actualizado = ?, error = ?"
+                " WHERE id = ?", updates,
+            )
+
+
+def get_uploader(path: str = None) -> SheetsUploader:
+    """
+    El hilo de subida del proceso para la cola de path (QUEUE_DB por
+    defecto): se crea una vez y retoma lo pendiente. La ruta se normaliza
+    para que get_uploader(), get_uploader(QUEUE_DB) y enqueue() den el
+    mismo hilo.
+    """
+    return _uploader(os.path.abspath(path or QUEUE_DB))
+
+
+@cached_resource
+def _uploader(path: str) -> SheetsUploader:
+    return SheetsUploader(path)
@@ -0,0 +1,318 @@
+# store_actas.py
+# --------------------------------------------------------
+# Base local persistente (SQLite + FTS5) con todo lo
+# extraído: filas del parser, entidades de Document AI y
+# textos completos, indexados por hash del archivo.
+# --------------------------------------------------------
+
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from metrics import span
+
+
+DB_PATH = os.environ.get("ACTAS_DB", os.path.join(".cache", "actas.db"))
+
+# Columnas del DataFrame del parser → columnas de la tabla filas
+ROW_COLUMNS = {
+    "Acta": "acta",
+    "Fecha": "fecha",
+    "Facultad": "facultad",
+    "Tipo_tema": "tipo_tema",
+    "Titulo_o_denominacion": "titulo",
+    "Director": "director",
+    "Estado": "estado",
+    "Destino_publicacion": "destino",
+    "Fuente_archivo": "fuente_archivo",
+    "Página": "pagina",
+}
+# Las demás columnas de build_dataframe (campos agregados en
+# config_patterns.yaml: Codirector, Equipo...) van juntas como JSON en
+# filas.extra, que también entra al índice de texto completo
+EXTRA_COLUMN = "extra"
+ENTITY_COLUMNS = {"Etiqueta": "etiqueta", "Valor": "valor", "Confianza": "confianza", "Página": "pagina"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    id         INTEGER PRIMARY KEY,
+    hash       TEXT NOT NULL UNIQUE,
+    archivo    TEXT NOT NULL,
+    origen     TEXT,
+    texto      TEXT,
+    procesado  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documentos_archivo ON documentos(archivo);
+
+CREATE TABLE IF NOT EXISTS filas (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    acta TEXT, fecha TEXT, facultad TEXT, tipo_tema TEXT, titulo TEXT,
+    director TEXT, estado TEXT, destino TEXT, fuente_archivo TEXT, pagina TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_filas_hash ON filas(hash);
+CREATE INDEX IF NOT EXISTS idx_filas_acta ON filas(acta);
+CREATE INDEX IF NOT EXISTS idx_filas_facultad ON filas(facultad COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_filas_director ON filas(director COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_filas_tipo_tema ON filas(tipo_tema);
+
+CREATE TABLE IF NOT EXISTS entidades (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    etiqueta TEXT, valor TEXT, confianza REAL, pagina TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entidades_hash ON entidades(hash);
+CREATE INDEX IF NOT EXISTS idx_entidades_etiqueta ON entidades(etiqueta);
+
+-- Índices de texto completo (sin acentos: "Perez" encuentra "Pérez"); el
+-- rowid de cada uno es una clave explícita de su tabla (VACUUM puede
+-- renumerar el rowid implícito y desincronizar el índice)
+CREATE VIRTUAL TABLE IF NOT EXISTS filas_fts USING fts5(
+    titulo, director, facultad, extra,
+    content='filas', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS textos_fts USING fts5(
+    texto, content='documentos', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS filas_ai AFTER INSERT ON filas BEGIN
+    INSERT INTO filas_fts(rowid, titulo, director, facultad, extra)
+    VALUES (new.id, new.titulo, new.director, new.facultad, new.extra);
+END;
+CREATE TRIGGER IF NOT EXISTS filas_ad AFTER DELETE ON filas BEGIN
+    INSERT INTO filas_fts(filas_fts, rowid, titulo, director, facultad, extra)
+    VALUES ('delete', old.id, old.titulo, old.director, old.facultad, old.extra);
+END;
+CREATE TRIGGER IF NOT EXISTS documentos_ai AFTER INSERT ON documentos BEGIN
+    INSERT INTO textos_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS documentos_ad AFTER DELETE ON documentos BEGIN
+    INSERT INTO textos_fts(textos_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+"""
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    if EXTRA_COLUMN not in {r["name"] for r in conn.execute("PRAGMA table_info(filas)")}:
+        _add_extra_column(conn)
+    if "id" not in {r["name"] for r in conn.execute("PRAGMA table_info(documentos)")}:
+        _add_documento_id(conn)
+    return conn
+
+
+def _add_extra_column(conn: sqlite3.Connection):
+    # Base anterior a filas.extra: se agrega la columna y se rehace filas_fts
+    # (no se le pueden agregar columnas) con sus triggers
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if EXTRA_COLUMN in {r["name"] for r in conn.execute("PRAGMA table_info(filas)")}:
+            return  # otro proceso ya migró
+        conn.execute(f"ALTER TABLE filas ADD COLUMN {EXTRA_COLUMN} TEXT")
+        conn.execute("DROP TRIGGER IF EXISTS filas_ai")
+        conn.execute("DROP TRIGGER IF EXISTS filas_ad")
+        conn.execute("DROP TABLE IF EXISTS filas_fts")
+    conn.executescript(_SCHEMA)
+    with conn:
+        conn.execute("INSERT INTO filas_fts(filas_fts) VALUES ('rebuild')")
+
+
+def _add_documento_id(conn: sqlite3.Connection):
+    # Base anterior a documentos.id (textos_fts iba por el rowid implícito):
+    # se copia la tabla con la clave explícita y se rehace textos_fts
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if "id" in {r["name"] for r in conn.execute("PRAGMA table_info(documentos)")}:
+            return  # otro proceso ya migró
+        conn.execute("DROP TRIGGER IF EXISTS documentos_ai")
+        conn.execute("DROP TRIGGER IF EXISTS documentos_ad")
+        conn.execute("DROP TABLE IF EXISTS textos_fts")
+        conn.execute("ALTER TABLE documentos RENAME TO documentos_anterior")
+        conn.execute(
+            "CREATE TABLE documentos (id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE, "
+            "archivo TEXT NOT NULL, origen TEXT, texto TEXT, procesado TEXT)")
+        conn.execute(
+            "INSERT INTO documentos(hash, archivo, origen, texto, procesado) "
+            "SELECT hash, archivo, origen, texto, procesado FROM documentos_anterior ORDER BY rowid")
+        conn.execute("DROP TABLE documentos_anterior")
+    conn.executescript(_SCHEMA)
+    with conn:
+        conn.execute("INSERT INTO textos_fts(textos_fts) VALUES ('rebuild')")
+
+
+def _records(df: pd.DataFrame, mapping: dict, doc_hash: str, extra: bool = False):
+    """
+    (columnas, valores) para insertar df. Con extra, las columnas que no
+    están en mapping se guardan como un objeto JSON en EXTRA_COLUMN.
+    """
+    if df is None or df.empty:
+        return [], []
+    cols = [c for c in mapping if c in df.columns]
+    values = df[cols].astype(object).where(df[cols].notna(), None).values.tolist()
+    names = ["hash"] + [mapping[c] for c in cols]
+    others = [c for c in df.columns if c not in mapping] if extra else []
+    if others:
+        data = df[others].astype(object).where(df[others].notna(), None).values.tolist()
+        for row, row_extra in zip(values, data):
+            row.append(json.dumps(dict(zip(others, row_extra)), ensure_ascii=False, default=str))
+        names.append(EXTRA_COLUMN)
+    return names, [[doc_hash] + v for v in values]
+
+
+def save_batch(docs, path: str = None, replace_archivo: bool = False):
+    """
+    Guarda una tanda de documentos en una sola transacción.
+    docs: iterable de {"hash", "archivo", "origen", "texto", "filas": df|None,
+    "entidades": df|None}; se consume de a un documento dentro de la
+    transacción (puede ser un generador que lee cada texto recién ahí).
+    Un documento con el mismo hash se reemplaza completo (filas, entidades
+    y texto). Con replace_archivo también se borran las versiones
+    anteriores del mismo archivo: solo tiene sentido si "archivo" identifica
+    al documento (la ruta relativa del modo batch), no con el nombre de una
+    subida, que dos actas distintas pueden compartir.
+    """
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    n_docs = n_rows = 0
+    with span("store_save") as sp:
+        conn = connect(path)
+        try:
+            with conn:
+                for d in docs:
+                    if replace_archivo:
+                        stale = (d["archivo"], d["hash"])
+                        for table in ("filas", "entidades"):
+                            conn.execute(
+                                f"DELETE FROM {table} WHERE hash IN (SELECT hash FROM documentos "
+                                "WHERE archivo = ? AND hash <> ?)", stale)
+                        conn.execute("DELETE FROM documentos WHERE archivo = ? AND hash <> ?", stale)
+                    for table in ("filas", "entidades", "documentos"):
+                        conn.execute(f"DELETE FROM {table} WHERE hash = ?", (d["hash"],))
+
+                    conn.execute(
+                        "INSERT INTO documentos(hash, archivo, origen, texto, procesado) VALUES (?, ?, ?, ?, ?)",
+                        (d["hash"], d["archivo"], d.get("origen"), d.get("texto"), now),
+                    )
+                    for table, key, mapping in (("filas", "filas", ROW_COLUMNS),
+                                                ("entidades", "entidades", ENTITY_COLUMNS)):
+                        cols, values = _records(d.get(key), mapping, d["hash"], extra=table == "filas")
+                        if values:
+                            conn.executemany(
+                                f"INSERT INTO {table}({', '.join(cols)}) "
+                                f"VALUES ({', '.join('?' * len(cols))})",
+                                values,
+                            )
+                            n_rows += len(values)
+                    n_docs += 1
+            sp["docs"], sp["rows"] = n_docs, n_rows
+        finally:
+            conn.close()
+    return n_docs
+
+
+def delete_files(archivos, path: str = None):
+    """Borra los documentos (y sus filas/entidades) de esos archivos."""
+    archivos = [(a,) for a in archivos]
+    if not archivos:
+        return
+    conn = connect(path)
+    try:
+        with conn:
+            for table in ("filas", "entidades"):
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE hash IN (SELECT hash FROM documentos WHERE archivo = ?)",
+                    archivos)
+            conn.executemany("DELETE FROM documentos WHERE archivo = ?", archivos)
+    finally:
+        conn.close()
+
+
+def _fts_phrase(value: str) -> str:
+    # Cada palabra como término entre comillas (evita la sintaxis de FTS5)
+    return " ".join('"' + w.replace('"', '""') + '"' for w in value.split())
+
+
+def search(text: str = None, acta: str = None, facultad: str = None, director: str = None,
+           tipo_tema: str = None, limit: int = 200, path: str = None) -> pd.DataFrame:
+    """
+    Filas del parser que cumplen todos los filtros dados.
+    acta / tipo_tema: igualdad exacta (índice).
+    facultad / director: todas las palabras, sin acentos ni mayúsculas (FTS).
+    text: palabras en título, director, facultad o campos extra de la
+    fila, o en el texto completo del acta de la que sale.
+    Los campos extra (filas.extra) vuelven como columnas después de
+    Director, como en parse_actas.output_columns.
+    """
+    where, params, fts = [], [], []
+    if acta:
+        where.append("f.acta = ?")
+        params.append(str(acta).strip())
+    if tipo_tema:
+        where.append("f.tipo_tema = ?")
+        params.append(tipo_tema)
+    if facultad:
+        fts.append(f"facultad : ({_fts_phrase(facultad)})")
+    if director:
+        fts.append(f"director : ({_fts_phrase(director)})")
+    if fts:
+        where.append("f.id IN (SELECT rowid FROM filas_fts WHERE filas_fts MATCH ?)")
+        params.append(" AND ".join(fts))
+    if text:
+        where.append(
+            "(f.id IN (SELECT rowid FROM filas_fts WHERE filas_fts MATCH ?)"
+            " OR f.hash IN (SELECT d.hash FROM documentos d WHERE d.id IN"
+            " (SELECT rowid FROM textos_fts WHERE textos_fts MATCH ?)))"
+        )
+        params += [_fts_phrase(text)] * 2
+
+    sql = (
+        "SELECT f.acta AS Acta, f.fecha AS Fecha, f.facultad AS Facultad, f.tipo_tema AS Tipo_tema, "
+        "f.titulo AS Titulo_o_denominacion, f.director AS Director, f.estado AS Estado, "
+        "f.destino AS Destino_publicacion, f.fuente_archivo AS Fuente_archivo, f.pagina AS \"Página\", "
+        "f.hash AS Hash, f.extra AS _extra FROM filas f"
+    )
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY f.id LIMIT ?"
+    params.append(int(limit))
+
+    with span("store_search") as sp:
+        conn = connect(path)
+        try:
+            df = pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+        sp["rows"] = len(df)
+    return _expand_extra(df)
+
+
+def _expand_extra(df: pd.DataFrame) -> pd.DataFrame:
+    extra = pd.DataFrame([json.loads(x) if x else {} for x in df.pop("_extra")], index=df.index)
+    if extra.empty:
+        return df
+    at = df.columns.get_loc("Director") + 1
+    return pd.concat([df.iloc[:, :at], extra.fillna(""), df.iloc[:, at:]], axis=1)
+
+
+def search_texts(text: str, limit: int = 50, path: str = None) -> pd.DataFrame:
+    """Documentos cuyo texto completo contiene todas las palabras, con un fragmento."""
+    sql = (
+        "SELECT d.archivo AS Archivo, d.origen AS Origen, d.procesado AS Procesado, "
+        "snippet(textos_fts, 0, '[', ']', ' … ', 16) AS Fragmento, d.hash AS Hash "
+        "FROM textos_fts JOIN documentos d ON d.id = textos_fts.rowid "
+        "WHERE textos_fts MATCH ? ORDER BY rank LIMIT ?"
+    )
+    conn = connect(path)
+    try:
+        return pd.read_sql_query(sql, conn, params=[_fts_phrase(text), int(limit)])
+    finally:
+        conn.close()
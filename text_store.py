@@ -0,0 +1,185 @@
+# text_store.py
+# --------------------------------------------------------
+# Almacén de textos completos fuera de los DataFrames: cada
+# texto se escribe una sola vez (UTF-8) al final de un
+# archivo temporal y se lee con mmap. Las tablas llevan solo
+# la referencia (offset, largo en bytes) y un extracto; la
+# vista previa, el filtro y las descargas leen del archivo
+# cuando hace falta, de a partes. Hay un almacén por sesión
+# de Streamlit: el archivo se libera cuando la sesión termina.
+# --------------------------------------------------------
+
+import mmap
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from metrics import span
+
+
+# Directorio del archivo (en disco: si fuera un tmpfs volvería a ocupar RAM)
+TEXT_STORE_DIR = os.environ.get("TEXT_STORE_DIR", ".cache")
+# Caracteres del extracto que queda en "Valor"
+SNIPPET_CHARS = 200
+# Filas por parte al leer los textos para exportar
+CHUNK_ROWS = 500
+
+# Columnas con la referencia de las filas TEXTO_COMPLETO
+OFFSET_COLUMN, LENGTH_COLUMN = "Texto_offset", "Texto_bytes"
+REF_COLUMNS = [OFFSET_COLUMN, LENGTH_COLUMN]
+
+
+class TextStore:
+    """
+    Archivo solo de agregado: put() escribe al final y devuelve
+    (offset, largo); get() lee esa porción por mmap (el mapa se rehace
+    cuando el archivo creció). Las páginas se cargan del disco a pedido y
+    el sistema las puede descartar, así que no cuentan como memoria del
+    proceso. El archivo no tiene nombre (tempfile.TemporaryFile): el
+    espacio se libera al cerrarlo (close(), o cuando el almacén deja de
+    estar referenciado, p.ej. al descartarse el session_state de la sesión
+    dueña). Las referencias solo valen para el almacén que las dio.
+    """
+
+    def __init__(self, directory: str = None):
+        directory = directory or TEXT_STORE_DIR
+        os.makedirs(directory, exist_ok=True)
+        self._fh = tempfile.TemporaryFile(dir=directory)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._map = None
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def put(self, text: str):
+        data = text.encode("utf-8")
+        with self._lock:
+            offset = self._size
+            self._fh.write(data)
+            self._fh.flush()
+            self._size += len(data)
+        return offset, len(data)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._fh.close()
+
+    def get(self, offset: int, length: int, limit: int = None) -> str:
+        """Texto de la referencia; con limit, solo los primeros `limit` bytes."""
+        if limit is not None:
+            length = min(length, limit)
+        if length <= 0:
+            return ""
+        with self._lock:
+            if self._map is None or offset + length > len(self._map):
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._fh.fileno(), self._size, access=mmap.ACCESS_READ)
+            data = self._map[offset:offset + length]
+        # Un corte por limit puede caer en medio de un carácter multibyte
+        return data.decode("utf-8", errors="ignore" if limit is not None else "strict")
+
+
+def _snippet(text: str) -> str:
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS] + "…"
+
+
+def spill(full_text: str, df_ent: pd.DataFrame, store: TextStore):
+    """
+    Pasa el texto completo al almacén. Devuelve (ref, entidades) donde ref
+    es (offset, largo) de full_text y, en una copia de las entidades, las
+    filas TEXTO_COMPLETO llevan un extracto en "Valor" y su referencia en
+    REF_COLUMNS. El texto de una página suele ser un tramo de full_text
+    (se unen con "\\n"): en ese caso se referencia ese tramo y no se
+    escribe dos veces.
+    """
+    with span("text_spill", chars=len(full_text)) as sp:
+        ref = store.put(full_text)
+        if df_ent.empty or "Etiqueta" not in df_ent:
+            return ref, df_ent.copy()
+        offsets, lengths = [None] * len(df_ent), [None] * len(df_ent)
+        values = df_ent["Valor"].tolist()
+        pos, pos_bytes = 0, ref[0]  # cursor en full_text (caracteres y bytes)
+        for i, (label, value) in enumerate(zip(df_ent["Etiqueta"], values)):
+            if label != "TEXTO_COMPLETO" or not isinstance(value, str):
+                continue
+            n_bytes = len(value.encode("utf-8"))
+            found = full_text.find(value, pos) if value else -1
+            if found >= 0:
+                pos_bytes += len(full_text[pos:found].encode("utf-8"))
+                offsets[i], lengths[i] = pos_bytes, n_bytes
+                pos, pos_bytes = found + len(value), pos_bytes + n_bytes
+            else:
+                offsets[i], lengths[i] = store.put(value)
+            values[i] = _snippet(value)
+        # Tabla nueva columna por columna: una copia (o un setitem) de df_ent
+        # deja las demás columnas como vistas del bloque 2D original, que
+        # sigue sosteniendo los textos completos
+        columns = {c: values if c == "Valor" else df_ent[c].to_numpy(copy=True) for c in df_ent.columns}
+        columns[OFFSET_COLUMN] = pd.array(offsets, dtype="Int64")
+        columns[LENGTH_COLUMN] = pd.array(lengths, dtype="Int64")
+        df_ent = pd.DataFrame(columns, index=df_ent.index.copy())
+        sp["store_bytes"] = store.size
+        return ref, df_ent
+
+
+def preview(ref, store: TextStore, chars: int = 3000) -> str:
+    """Vista previa de un texto del almacén (lee solo el principio)."""
+    # Hasta 4 bytes por carácter en UTF-8
+    text = store.get(*ref, limit=chars * 4)
+    if len(text) <= chars and len(text.encode("utf-8")) >= ref[1]:
+        return text
+    return text[:chars] + "\n...\n[texto truncado]"
+
+
+def drop_refs(df: pd.DataFrame) -> pd.DataFrame:
+    """La tabla sin las columnas de referencia (para mostrarla)."""
+    return df.drop(columns=REF_COLUMNS, errors="ignore")
+
+
+def iter_resolved(df: pd.DataFrame, store: TextStore, chunk_rows: int = CHUNK_ROWS):
+    """
+    Recorre df de a chunk_rows filas con el texto completo en "Valor" y sin
+    REF_COLUMNS: en memoria hay a la vez los textos de una parte, no los de
+    toda la tabla. Siempre entrega al menos una parte (vacía si df lo está).
+    """
+    if not set(REF_COLUMNS) <= set(df.columns):
+        yield df
+        return
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        has_ref = chunk[OFFSET_COLUMN].notna().to_numpy()
+        if has_ref.any():
+            values = chunk["Valor"].to_numpy(dtype=object, copy=True)
+            refs = zip(chunk[OFFSET_COLUMN].to_numpy()[has_ref], chunk[LENGTH_COLUMN].to_numpy()[has_ref])
+            values[has_ref] = [store.get(int(o), int(n)) for o, n in refs]
+            chunk = chunk.assign(Valor=values)
+        yield drop_refs(chunk)
+
+
+def resolve(df: pd.DataFrame, store: TextStore) -> pd.DataFrame:
+    """df completo con los textos cargados (para lo que necesita todo junto)."""
+    return pd.concat(iter_resolved(df, store), ignore_index=True)
+
+
+def contains(df: pd.DataFrame, query: str, store: TextStore) -> pd.Series:
+    """
+    Máscara de las filas cuyo "Valor" contiene query (sin mayúsculas); en
+    las filas con referencia se busca en el texto completo del almacén.
+    """
+    mask = df["Valor"].astype(str).str.contains(query, case=False, regex=False)
+    if OFFSET_COLUMN not in df:
+        return mask
+    needle = query.casefold()
+    has_ref = df[OFFSET_COLUMN].notna().to_numpy()
+    found = mask.to_numpy(copy=True)
+    refs = zip(df[OFFSET_COLUMN].to_numpy()[has_ref], df[LENGTH_COLUMN].to_numpy()[has_ref])
+    found[has_ref] = [needle in store.get(int(o), int(n)).casefold() for o, n in refs]
+    return pd.Series(found, index=df.index)
@@ -4,73 +4,273 @@
 # de servicio que pegaste en Streamlit Secrets.
 # --------------------------------------------------------
 
+import hashlib
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
 
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google.oauth2 import service_account
+# googleapiclient / google-auth se importan recién al subir
+from metrics import span
+from resources import cached_resource, get_gcp_credentials
+
+
+def _secret(section: str, key: str, env: str):
+    # st.secrets en la app; variables de entorno en modo batch (sync.yml)
+    try:
+        return st.secrets[section][key]
+    except Exception:
+        return os.environ.get(env)
+
+
+# ============= SERVICIO (cacheado) =============
+_sheet_ids = {}
+
+# Filas por llamada a batchUpdate (límite de payload de la API)
+CHUNK_ROWS = 500
+
+DEFAULT_KEY_COLUMNS = ("Acta", "Fuente_archivo", "Titulo_o_denominacion")
+ENTITY_KEY_COLUMNS = ("Archivo", "Etiqueta", "Valor")
+SOURCE_COLUMNS = ("Fuente_archivo", "Archivo")
 
 
-def _get_gcp_credentials(scopes=None):
-    creds = service_account.Credentials.from_service_account_info(
-        st.secrets["gcp_service_account"]
-    )
-    if scopes:
-        creds = creds.with_scopes(scopes)
-    return creds
+def _get_service():
+    """
+    Servicio de Sheets reutilizado entre llamadas.
+    [sheets] api_endpoint / SHEETS_API_ENDPOINT permite apuntar a un
+    servidor local de prueba (http://...), que se usa sin credenciales.
+    """
+    return _build_service(_secret("sheets", "api_endpoint", "SHEETS_API_ENDPOINT"))
+
+
+@cached_resource
+def _build_service(endpoint):
+    from googleapiclient.discovery import build
 
+    if endpoint and endpoint.startswith("http://"):
+        from google.auth.credentials import AnonymousCredentials
+        creds = AnonymousCredentials()
+    else:
+        creds = get_gcp_credentials(scopes=["https://www.googleapis.com/auth/spreadsheets"])
+    options = {"api_endpoint": endpoint} if endpoint else None
+    return build("sheets", "v4", credentials=creds, client_options=options,
+                 cache_discovery=False)
 
-def _ensure_sheet_exists(service, spreadsheet_id: str, sheet_name: str):
+
+def _ensure_sheet_exists(service, spreadsheet_id: str, sheet_name: str) -> int:
+    """Crea la pestaña si no existe y devuelve su sheetId (cacheado)."""
+    cache_key = (spreadsheet_id, sheet_name)
+    if cache_key in _sheet_ids:
+        return _sheet_ids[cache_key]
     meta = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    titles = [s["properties"]["title"] for s in meta.get("sheets", [])]
-    if sheet_name not in titles:
-        service.spreadsheets().batchUpdate(
+    for s in meta.get("sheets", []):
+        _sheet_ids[(spreadsheet_id, s["properties"]["title"])] = s["properties"]["sheetId"]
+    if cache_key not in _sheet_ids:
+        resp = service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
             body={"requests": [{"addSheet": {"properties": {"title": sheet_name}}}]}
         ).execute()
+        _sheet_ids[cache_key] = resp["replies"][0]["addSheet"]["properties"]["sheetId"]
+    return _sheet_ids[cache_key]
+
+
+# ============= DIFF DE FILAS =============
+def _key_columns(columns):
+    for cand in (DEFAULT_KEY_COLUMNS, ENTITY_KEY_COLUMNS):
+        if all(c in columns for c in cand):
+            return list(cand)
+    return list(columns)
 
 
-def upload_dataframe_to_sheet(df: pd.DataFrame, spreadsheet_id: str = None, sheet_name: str = None) -> bool:
+def _row_keys(rows, idx):
     """
-    Sube df al Google Sheet indicado.
-    Si no pasas IDs, toma los de [sheets] en secrets.
-    Requiere que hayas compartido el Sheet con la service account como Editor.
+    Identidad estable de cada fila: hash de las columnas clave
+    (p.ej. Acta + Fuente_archivo + título) + n° de ocurrencia,
+    para que las filas repetidas no colisionen.
     """
-    if df is None or df.empty:
-        st.error("El DataFrame está vacío, no hay nada para subir.")
+    seen = {}
+    keys = []
+    for r in rows:
+        base = hashlib.sha1("\x1f".join(r[i] for i in idx).encode("utf-8")).hexdigest()
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append((base, n))
+    return keys
+
+
+def compute_row_delta(current, new, columns, key_columns=None, delete_missing=False):
+    """
+    Compara las filas actuales de la hoja (sin encabezado) con las nuevas.
+    Devuelve (updates, appends, deletes):
+      updates: [(índice_fila, valores)] filas existentes que cambiaron
+      appends: [valores] filas nuevas
+      deletes: [índice_fila] filas que ya no están
+    Los índices son 0-based sobre `current`. Sin delete_missing solo se
+    borran filas de archivos (Fuente_archivo/Archivo) presentes en `new`.
+    """
+    width = len(columns)
+    current = [(list(r) + [""] * width)[:width] for r in current]
+    idx = [columns.index(c) for c in (key_columns or _key_columns(columns))]
+
+    cur_pos = {k: i for i, k in enumerate(_row_keys(current, idx))}
+    new_keys = _row_keys(new, idx)
+
+    updates, appends = [], []
+    for k, row in zip(new_keys, new):
+        i = cur_pos.get(k)
+        if i is None:
+            appends.append(row)
+        elif current[i] != row:
+            updates.append((i, row))
+
+    wanted = set(new_keys)
+    src = next((columns.index(c) for c in SOURCE_COLUMNS if c in columns), None)
+    sources = {r[src] for r in new} if src is not None else None
+    deletes = []
+    for k, i in cur_pos.items():
+        if k in wanted:
+            continue
+        if delete_missing or sources is None or current[i][src] in sources:
+            deletes.append(i)
+    return updates, appends, sorted(deletes)
+
+
+def _chunks(seq, size):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _cell(v: str):
+    return {"userEnteredValue": {"stringValue": v}}
+
+
+def _upsert(service, spreadsheet_id, sheet_name, sheet_id, columns, values, delete_missing, sp):
+    resp = service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id, range=f"'{sheet_name}'!A:ZZ"
+    ).execute()
+    current = resp.get("values", [])
+
+    if not current or current[0] != columns:
+        # Hoja vacía o con otras columnas: no hay con qué comparar
         return False
 
+    updates, appends, deletes = compute_row_delta(current[1:], values, columns,
+                                                  delete_missing=delete_missing)
+    sp.update(updated=len(updates), appended=len(appends), deleted=len(deletes))
+
+    # 1) Filas modificadas: rangos puntuales (fila i → fila i+2 en la hoja)
+    for chunk in _chunks(updates, CHUNK_ROWS):
+        service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={
+                "valueInputOption": "RAW",
+                "data": [{"range": f"'{sheet_name}'!A{i + 2}", "values": [row]} for i, row in chunk],
+            },
+        ).execute()
+
+    # 2) Borrados de abajo hacia arriba (agrupando filas contiguas), así no se
+    #    corren los índices; 3) altas al final con appendCells
+    requests = []
+    for i in reversed(deletes):
+        if requests and requests[-1]["deleteDimension"]["range"]["startIndex"] == i + 2:
+            requests[-1]["deleteDimension"]["range"]["startIndex"] = i + 1
+        else:
+            requests.append({"deleteDimension": {"range": {
+                "sheetId": sheet_id, "dimension": "ROWS", "startIndex": i + 1, "endIndex": i + 2,
+            }}})
+    for chunk in _chunks(appends, CHUNK_ROWS):
+        requests.append({"appendCells": {
+            "sheetId": sheet_id,
+            "rows": [{"values": [_cell(v) for v in row]} for row in chunk],
+            "fields": "userEnteredValue",
+        }})
+    for chunk in _chunks(requests, CHUNK_ROWS):
+        service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id, body={"requests": chunk}
+        ).execute()
+    return True
+
+
+def _replace(service, spreadsheet_id, sheet_name, columns, values):
+    # Limpia contenido previo
+    service.spreadsheets().values().clear(
+        spreadsheetId=spreadsheet_id,
+        range=f"'{sheet_name}'!A:ZZ"
+    ).execute()
+
+    # Escribe encabezados + filas
+    service.spreadsheets().values().update(
+        spreadsheetId=spreadsheet_id,
+        range=f"'{sheet_name}'!A1",
+        valueInputOption="RAW",
+        body={"values": [columns] + values},
+    ).execute()
+
+
+def resolve_target(spreadsheet_id: str = None, sheet_name: str = None):
+    """(spreadsheet_id, sheet_name): los que falten salen de [sheets] / entorno."""
     if spreadsheet_id is None:
-        spreadsheet_id = st.secrets["sheets"]["spreadsheet_id"]
+        spreadsheet_id = _secret("sheets", "spreadsheet_id", "SPREADSHEET_ID")
     if sheet_name is None:
-        sheet_name = st.secrets["sheets"]["sheet_name"]
+        sheet_name = _secret("sheets", "sheet_name", "WORKSHEET_NAME")
+    return spreadsheet_id, sheet_name
 
-    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = _get_gcp_credentials(scopes=scopes)
-    service = build("sheets", "v4", credentials=creds)
 
-    try:
+def upload_values(columns, values, spreadsheet_id: str, sheet_name: str,
+                  mode: str = "upsert", delete_missing: bool = False):
+    """
+    Sube filas ya pasadas a str (ver upload_dataframe_to_sheet para los
+    modos). Sin Streamlit: los errores de la API (HttpError) se propagan,
+    así la cola de sheets_queue decide si reintentar.
+    """
+    service = _get_service()
+    with span("sheets_upload", rows=len(values), mode=mode) as sp:
         # Crea la pestaña si no existe
-        _ensure_sheet_exists(service, spreadsheet_id, sheet_name)
+        sheet_id = _ensure_sheet_exists(service, spreadsheet_id, sheet_name)
 
-        # Limpia contenido previo
-        service.spreadsheets().values().clear(
-            spreadsheetId=spreadsheet_id,
-            range=f"'{sheet_name}'!A:ZZ"
-        ).execute()
+        if mode == "upsert" and _upsert(service, spreadsheet_id, sheet_name, sheet_id,
+                                        columns, values, delete_missing, sp):
+            return
+        sp["mode"] = "replace"
+        _replace(service, spreadsheet_id, sheet_name, columns, values)
 
-        # Escribe encabezados + filas
-        values = [list(df.columns)] + df.astype(str).values.tolist()
-        service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range=f"'{sheet_name}'!A1",
-            valueInputOption="RAW",
-            body={"values": values},
-        ).execute()
 
-        return True
+def upload_dataframe_to_sheet(df: pd.DataFrame, spreadsheet_id: str = None, sheet_name: str = None,
+                              mode: str = "upsert", delete_missing: bool = False) -> bool:
+    """
+    Sube df al Google Sheet indicado (en el momento; la app usa la cola
+    de sheets_queue para no bloquear).
+    Si no pasas IDs, toma los de [sheets] en secrets
+    (o SPREADSHEET_ID / WORKSHEET_NAME del entorno en modo batch).
+    mode="upsert": lee la hoja una vez y envía solo las filas nuevas,
+    modificadas o borradas (ver compute_row_delta). Si la hoja está vacía
+    o tiene otras columnas, se reescribe completa.
+    mode="replace": borra la hoja y escribe todo de nuevo.
+    Requiere que hayas compartido el Sheet con la service account como Editor.
+    """
+    if df is None or df.empty:
+        st.error("El DataFrame está vacío, no hay nada para subir.")
+        return False
+
+    spreadsheet_id, sheet_name = resolve_target(spreadsheet_id, sheet_name)
+
+    from googleapiclient.errors import HttpError
 
+    try:
+        upload_values([str(c) for c in df.columns], df.astype(str).values.tolist(),
+                      spreadsheet_id, sheet_name, mode, delete_missing)
+        return True
     except HttpError as e:
         st.error(f"Error subiendo a Sheets: {e}")
         return False
+
+
+if __name__ == "__main__":
+    # python upload_to_sheets.py → sube OUTPUT_CSV generado por el modo batch
+    output_csv = os.environ.get("OUTPUT_CSV", "actas_extraccion.csv")
+    df = pd.read_csv(output_csv, dtype=str, keep_default_na=False)
+    # OUTPUT_CSV es la base completa: lo que no está se borra de la hoja
+    ok = upload_dataframe_to_sheet(df, delete_missing=True)
+    print(f"[sheets] {len(df)} filas de {output_csv}: {'OK' if ok else 'ERROR'}")
+    sys.exit(0 if ok else 1)